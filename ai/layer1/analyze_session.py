@@ -1,17 +1,25 @@
 # analyze_session.py
 
+import argparse
+import asyncio
 import json
 import os
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 
 from dotenv import load_dotenv
 
 from schema import make_layer1_result_template
+from ratelimit import RateLimiter, estimate_tokens, is_rate_limit_error, retry_after
+from cache import ResponseCache, cache_key
+from manifest import DONE, FAILED, RunManifest, session_input_hash
+from fingerprint import cluster_sessions, cluster_sizes, fan_out_fields, representative_of
 from prompts import (
     build_session_digest,
     build_layer1_system_prompt,
     build_layer1_user_prompt,
+    build_layer1_batch_system_prompt,
+    build_layer1_batch_user_prompt,
 )
 
 from langchain_openai import ChatOpenAI
@@ -21,12 +29,33 @@ from langchain_core.messages import SystemMessage, HumanMessage
 load_dotenv()
 
 
+LAYER1_MODEL = "gpt-4o-mini"
+LAYER1_TEMPERATURE = 0.1
+
+# Concurrent model calls of the async runner, and its per-minute limits (0 = unlimited)
+LAYER1_CONCURRENCY = int(os.getenv("TPOT_AI_LAYER1_CONCURRENCY", "8"))
+LAYER1_RPM = int(os.getenv("TPOT_AI_LAYER1_RPM", "500"))
+LAYER1_TPM = int(os.getenv("TPOT_AI_LAYER1_TPM", "200000"))
+# Attempts per session on 429s before it is reported as failed
+LAYER1_MAX_RETRIES = int(os.getenv("TPOT_AI_LAYER1_MAX_RETRIES", "6"))
+# Expected completion size, counted against the TPM limit up front
+LAYER1_OUTPUT_TOKENS = 600
+# Analyze one session per cluster of duplicates: off, exact or near (MinHash)
+LAYER1_DEDUP = os.getenv("TPOT_AI_LAYER1_DEDUP", "off")
+# Batch mode: sessions of at most BATCH_MAX_EVENTS events are packed into
+# one request, up to BATCH_SIZE sessions and BATCH_TOKENS prompt tokens
+LAYER1_BATCH_TOKENS = int(os.getenv("TPOT_AI_LAYER1_BATCH_TOKENS", "6000"))
+LAYER1_BATCH_SIZE = int(os.getenv("TPOT_AI_LAYER1_BATCH_SIZE", "10"))
+LAYER1_BATCH_MAX_EVENTS = int(os.getenv("TPOT_AI_LAYER1_BATCH_MAX_EVENTS", "20"))
+
+
 def get_env_path(name: str, default: str) -> Path:
     value = os.getenv(name, default)
     return Path(value)
 
 
-def load_sessions_for_day(base_dir: Path, date_str: str) -> List[Dict[str, Any]]:
+def read_session_array(path: Path) -> List[Dict[str, Any]]:
+    """Sessions of a <sensor>_sessions.json file (the format before NDJSON)."""
 
     def flatten_sessions(obj):
         flat = []
@@ -37,26 +66,130 @@ def load_sessions_for_day(base_dir: Path, date_str: str) -> List[Dict[str, Any]]
                 flat.extend(flatten_sessions(item))
         return flat
 
-    sessions = []
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    return [
+        obj for obj in flatten_sessions(data)
+        if isinstance(obj, dict) and "session_id" in obj and "events" in obj
+    ]
+
+
+# Per sensor, the first of these found in a day directory is its session source
+SESSION_FILE_SUFFIXES = (
+    "_sessions.ndjson",         # etl/sessionize.py
+    "_sessions.json",           # etl/sessionize.py, before NDJSON
+    "_stream_sessions.ndjson",  # etl/stream_sessionize.py
+)
+
+_warned_ignored = set()
+
+
+def session_files_for_day(base_dir: Path, date_str: str) -> List[Path]:
+    """
+    One session file per sensor. Batch and streaming sessionize cover the
+    same events, so when both wrote a sensor's sessions only the batch
+    output is read.
+    """
     date_dir = base_dir / date_str
 
     if not date_dir.exists():
         raise FileNotFoundError(f"Session directory does not exist: {date_dir}")
 
+    found: Dict[str, Dict[str, Path]] = {}
     for filename in sorted(date_dir.iterdir()):
-        if not filename.name.endswith("_sessions.json"):
-            continue
+        # Longest suffix first: "x_stream_sessions.ndjson" also ends in "_sessions.ndjson"
+        for suffix in sorted(SESSION_FILE_SUFFIXES, key=len, reverse=True):
+            if filename.name.endswith(suffix):
+                sensor = filename.name[: -len(suffix)]
+                found.setdefault(sensor, {})[suffix] = filename
+                break
+
+    files = []
+    for sensor, by_suffix in sorted(found.items()):
+        chosen = next(by_suffix[suffix] for suffix in SESSION_FILE_SUFFIXES if suffix in by_suffix)
+        if len(by_suffix) > 1 and chosen not in _warned_ignored:
+            _warned_ignored.add(chosen)
+            ignored = ", ".join(p.name for p in by_suffix.values() if p != chosen)
+            print(f"[WARN] {date_str} {sensor}: reading {chosen.name}, ignoring {ignored}")
+        files.append(chosen)
+    return files
+
+
+def iter_sessions_for_day(base_dir: Path, date_str: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the sessions of one day, one at a time. NDJSON session files
+    (one session per line) are streamed; days written before that format
+    (<sensor>_sessions.json arrays) are still loaded whole.
+    """
+
+    for filename in session_files_for_day(base_dir, date_str):
+        if filename.name.endswith(".ndjson"):
+            with filename.open("r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        else:
+            yield from read_session_array(filename)
 
-        with filename.open("r", encoding="utf-8") as f:
-            data = json.load(f)
 
-        flattened = flatten_sessions(data)
+def index_file_for(filename: Path) -> Path:
+    return filename.with_name(filename.name[: -len(".ndjson")] + ".index.ndjson")
+
+
+def load_sessions_for_day(base_dir: Path, date_str: str) -> List[Dict[str, Any]]:
+    return list(iter_sessions_for_day(base_dir, date_str))
 
-        for obj in flattened:
-            if isinstance(obj, dict) and "session_id" in obj and "events" in obj:
-                sessions.append(obj)
 
-    return sessions
+def load_session_index(base_dir: Path, date_str: str) -> Dict[str, Dict[str, Any]]:
+    """
+    session_id -> index entry (sensor, src_ip, start, end, event_count,
+    file, offset, length) from the indexes of the day's session files.
+    """
+    index = {}
+    for filename in session_files_for_day(base_dir, date_str):
+        index_file = index_file_for(filename) if filename.name.endswith(".ndjson") else None
+        if index_file is None or not index_file.exists():
+            continue
+        with index_file.open("r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    index.setdefault(entry["session_id"], entry)
+    return index
+
+
+def load_session(
+    base_dir: Path,
+    date_str: str,
+    session_id: str,
+    index: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Read one session by id with a single seek into its NDJSON file. Pass
+    the result of load_session_index() when looking up many sessions.
+    """
+    if index is None:
+        index = load_session_index(base_dir, date_str)
+    entry = index.get(session_id)
+    if entry is None:
+        return None
+    with (base_dir / date_str / entry["file"]).open("rb") as f:
+        f.seek(entry["offset"])
+        return json.loads(f.read(entry["length"]))
+
+
+def count_sessions_for_day(base_dir: Path, date_str: str) -> int:
+    """Number of sessions of a day, from the indexes where they exist."""
+    total = 0
+    for filename in session_files_for_day(base_dir, date_str):
+        if filename.name.endswith(".ndjson"):
+            index_file = index_file_for(filename)
+            source = index_file if index_file.exists() else filename
+            with source.open("r", encoding="utf-8") as f:
+                total += sum(1 for line in f if line.strip())
+        else:
+            total += len(read_session_array(filename))
+    return total
 
 
 def make_model() -> ChatOpenAI:
@@ -65,8 +198,8 @@ def make_model() -> ChatOpenAI:
     gpt-4o-mini for cost efficiency.
     """
     model = ChatOpenAI(
-        model="gpt-4o-mini",
-        temperature=0.1,
+        model=LAYER1_MODEL,
+        temperature=LAYER1_TEMPERATURE,
     )
     return model
 
@@ -152,34 +285,34 @@ def extract_key_indicators_from_session(session: Dict[str, Any]) -> Dict[str, An
 
 
 
-def analyze_single_session(model: ChatOpenAI, session: Dict[str, Any]) -> Dict[str, Any]:
-    """
-    Analyze one session with AI Layer 1 and return the parsed JSON dict.
-    """
-
+def build_messages(session: Dict[str, Any]) -> List[Any]:
     session_digest = build_session_digest(session)
     system_prompt = build_layer1_system_prompt()
     user_prompt = build_layer1_user_prompt(session_digest)
 
-    messages = [
+    return [
         SystemMessage(content=system_prompt),
         HumanMessage(content=user_prompt),
     ]
 
-    response = model.invoke(messages)
-    content = response.content
 
-    # Try to parse JSON
+def parse_model_output(content: str) -> Dict[str, Any]:
+    """The JSON object in a model reply, tolerating text around it."""
     try:
-        result = json.loads(content)
+        return json.loads(content)
     except json.JSONDecodeError:
         start_idx = content.find("{")
         end_idx = content.rfind("}")
         if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
             json_str = content[start_idx : end_idx + 1]
-            result = json.loads(json_str)
-        else:
-            raise ValueError(f"Model did not return valid JSON. Content was:\n{content}")
+            return json.loads(json_str)
+        raise ValueError(f"Model did not return valid JSON. Content was:\n{content}")
+
+
+def merge_analysis(session: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Layer 1 result for a session from the parsed model output.
+    """
 
     # Start from schema template (ensures all fields exist)
     template = make_layer1_result_template(session)
@@ -199,7 +332,209 @@ def analyze_single_session(model: ChatOpenAI, session: Dict[str, Any]) -> Dict[s
     return merged
 
 
-def save_analysis(output_dir: Path, date_str: str, session: Dict[str, Any], analysis: Dict[str, Any]) -> None:
+def model_cache_key(model: ChatOpenAI, messages: List[Any]) -> str:
+    return cache_key(
+        getattr(model, "model_name", LAYER1_MODEL),
+        getattr(model, "temperature", LAYER1_TEMPERATURE),
+        messages,
+    )
+
+
+def analyze_single_session(
+    model: ChatOpenAI,
+    session: Dict[str, Any],
+    cache: Optional[ResponseCache] = None,
+) -> Dict[str, Any]:
+    """
+    Analyze one session with AI Layer 1 and return the parsed JSON dict.
+    """
+
+    messages = build_messages(session)
+    key = model_cache_key(model, messages) if cache else None
+    result = cache.get(key) if cache else None
+    if result is None:
+        response = model.invoke(messages)
+        result = parse_model_output(response.content)
+        if cache:
+            cache.put(key, result)
+    return merge_analysis(session, result)
+
+
+def fan_out_analysis(session: Dict[str, Any], representative: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Analysis of a session from the analysis of its cluster representative:
+    the model's verdict is shared, ids, timestamps and key_indicators are
+    the session's own.
+    """
+    merged = merge_analysis(session, fan_out_fields(representative))
+    merged["duplicate_of"] = representative["session_id"]
+    return merged
+
+
+def response_tokens(response: Any) -> Optional[int]:
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        return usage.get("total_tokens")
+    return None
+
+
+async def analyze_session_async(
+    model: ChatOpenAI,
+    session: Dict[str, Any],
+    limiter: RateLimiter,
+    cache: Optional[ResponseCache] = None,
+    max_retries: int = LAYER1_MAX_RETRIES,
+    messages: Optional[List[Any]] = None,
+) -> Dict[str, Any]:
+    """
+    analyze_single_session with ainvoke, under the shared rate limiter.
+    A 429 pauses every caller (Retry-After, or exponential backoff) and is
+    retried up to `max_retries` times. Cache hits make no call at all.
+    """
+    if messages is None:
+        messages = build_messages(session)
+    key = model_cache_key(model, messages) if cache else None
+    if cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return merge_analysis(session, cached)
+
+    estimate = sum(estimate_tokens(m.content) for m in messages) + LAYER1_OUTPUT_TOKENS
+    response = await invoke_with_retries(model, messages, limiter, estimate, session.get("session_id"), max_retries)
+    result = parse_model_output(response.content)
+    if cache:
+        cache.put(key, result)
+    return merge_analysis(session, result)
+
+
+async def invoke_with_retries(
+    model: ChatOpenAI,
+    messages: List[Any],
+    limiter: RateLimiter,
+    estimate: int,
+    label: str,
+    max_retries: int = LAYER1_MAX_RETRIES,
+) -> Any:
+    """
+    One ainvoke under the shared rate limiter. A 429 pauses every caller
+    (Retry-After, or exponential backoff) and is retried up to
+    `max_retries` times.
+    """
+    attempt = 0
+    while True:
+        ticket = await limiter.acquire(estimate)
+        try:
+            response = await model.ainvoke(messages)
+        except Exception as e:
+            if not is_rate_limit_error(e) or attempt >= max_retries:
+                raise
+            delay = retry_after(e, attempt)
+            limiter.pause(delay)
+            attempt += 1
+            print(f"[AI-L1] Rate limited on {label}, retrying in {delay:.1f}s "
+                  f"(attempt {attempt}/{max_retries})")
+            continue
+        limiter.settle(ticket, response_tokens(response))
+        return response
+
+
+def build_batch_messages(sessions: List[Dict[str, Any]]) -> List[Any]:
+    digests = [(s.get("session_id", ""), build_session_digest(s)) for s in sessions]
+    return [
+        SystemMessage(content=build_layer1_batch_system_prompt()),
+        HumanMessage(content=build_layer1_batch_user_prompt(digests)),
+    ]
+
+
+def batch_cache_key(model: ChatOpenAI, session: Dict[str, Any]) -> str:
+    """
+    Cache key for a session's answer taken from a batch reply: the batch
+    prompt with this session alone. Batch answers therefore never satisfy
+    a single-call lookup, nor single-call answers a batch one.
+    """
+    return model_cache_key(model, build_batch_messages([session]))
+
+
+def fits_batch(session: Dict[str, Any]) -> bool:
+    return len(session.get("events", [])) <= LAYER1_BATCH_MAX_EVENTS
+
+
+def parse_batch_output(content: str, session_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    session_id -> parsed object from a batch reply (a JSON array, possibly
+    wrapped in text). Objects for unknown ids, duplicates after the first
+    and non-objects are dropped; callers redo whatever is missing.
+    """
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        start_idx = content.find("[")
+        end_idx = content.rfind("]")
+        if start_idx == -1 or end_idx <= start_idx:
+            raise ValueError(f"Model did not return a JSON array. Content was:\n{content}")
+        data = json.loads(content[start_idx : end_idx + 1])
+    if isinstance(data, dict):
+        # e.g. {"sessions": [...]}
+        data = next((v for v in data.values() if isinstance(v, list)), [data])
+
+    wanted = set(session_ids)
+    results: Dict[str, Dict[str, Any]] = {}
+    for item in data:
+        if isinstance(item, dict) and item.get("session_id") in wanted:
+            results.setdefault(item["session_id"], item)
+    return results
+
+
+async def analyze_batch_async(
+    model: ChatOpenAI,
+    sessions: List[Dict[str, Any]],
+    limiter: RateLimiter,
+    cache: Optional[ResponseCache] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Analyze several small sessions with one request. Returns the analyses
+    it could get, by session_id: cache hits (under batch_cache_key) and
+    the sessions the reply answered validly. The caller falls back to
+    single calls for the rest; a failed batch request returns only the
+    cache hits.
+    """
+    analyses: Dict[str, Dict[str, Any]] = {}
+    todo = []
+    for session in sessions:
+        key = batch_cache_key(model, session) if cache else None
+        cached = cache.get(key) if cache else None
+        if cached is not None:
+            analyses[session["session_id"]] = merge_analysis(session, cached)
+        else:
+            todo.append((session, key))
+    if len(todo) < 2:
+        return analyses
+
+    sessions = [session for session, _ in todo]
+    session_ids = [session["session_id"] for session in sessions]
+    messages = build_batch_messages(sessions)
+    estimate = sum(estimate_tokens(m.content) for m in messages) + LAYER1_OUTPUT_TOKENS * len(sessions)
+    try:
+        response = await invoke_with_retries(model, messages, limiter, estimate, f"batch of {len(sessions)}")
+        results = parse_batch_output(response.content, session_ids)
+    except Exception as e:
+        print(f"[WARN] Batch of {len(sessions)} sessions failed, falling back to single calls: {e}")
+        return analyses
+
+    if len(results) < len(sessions):
+        print(f"[WARN] Batch reply covered {len(results)}/{len(sessions)} sessions, "
+              f"redoing the rest one by one")
+    for session, key in todo:
+        result = results.get(session["session_id"])
+        if result is None:
+            continue
+        if cache:
+            cache.put(key, result)
+        analyses[session["session_id"]] = merge_analysis(session, result)
+    return analyses
+
+
+def save_analysis(output_dir: Path, date_str: str, session: Dict[str, Any], analysis: Dict[str, Any]) -> Path:
     """
     Save the analysis JSON per session.
     Path example:
@@ -215,49 +550,228 @@ def save_analysis(output_dir: Path, date_str: str, session: Dict[str, Any], anal
     target_file = target_dir / f"{session_id}.json"
     with target_file.open("w", encoding="utf-8") as f:
         json.dump(analysis, f, indent=2)
-
-
-def run_layer1_for_date(date_str: str) -> None:
+    return target_file
+
+
+def run_layer1_for_date(
+    date_str: str,
+    concurrency: int = LAYER1_CONCURRENCY,
+    rpm: int = LAYER1_RPM,
+    tpm: int = LAYER1_TPM,
+    use_cache: bool = True,
+    retry_failed: bool = False,
+    dedup: str = LAYER1_DEDUP,
+    batch: bool = False,
+) -> None:
     """
     Main entry point: run AI Layer 1 over all sessions for one day.
     """
+    asyncio.run(run_layer1_for_date_async(date_str, concurrency, rpm, tpm, use_cache, retry_failed, dedup, batch))
+
+
+async def run_layer1_for_date_async(
+    date_str: str,
+    concurrency: int = LAYER1_CONCURRENCY,
+    rpm: int = LAYER1_RPM,
+    tpm: int = LAYER1_TPM,
+    use_cache: bool = True,
+    retry_failed: bool = False,
+    dedup: str = LAYER1_DEDUP,
+    batch: bool = False,
+) -> None:
+    """
+    Analyze a day's sessions with up to `concurrency` model calls in
+    flight, within `rpm` requests and `tpm` tokens per minute. Sessions
+    are streamed from disk through a bounded queue and each analysis is
+    saved as soon as it completes. Model outputs are looked up in and
+    added to the response cache unless `use_cache` is False.
+
+    Every outcome goes to the day's manifest.ndjson. Sessions already done
+    with the same input hash are skipped, so a rerun after a crash only
+    does what is missing; with `retry_failed` only the sessions whose
+    last attempt failed are run.
+
+    With `dedup` ("exact" or "near"), sessions are first clustered by
+    fingerprint (see fingerprint.py); only each cluster's representative
+    goes to the model and its verdict is fanned out to the rest.
+
+    With `batch`, small sessions are packed several to a request (see
+    LAYER1_BATCH_*); sessions missing from a batch reply are redone alone.
+    """
 
     session_dir = get_env_path("TPOT_SESSIONIZED_DIR", "/data/tpot_sessions/sessionized")
     output_dir = get_env_path("TPOT_AI_LAYER1_DIR", "/data/tpot_sessions/ai_layer1")
 
-    sessions = load_sessions_for_day(session_dir, date_str)
-    total = len(sessions)
+    total = count_sessions_for_day(session_dir, date_str)
 
-    print(f"[INFO] Loaded {total} sessions for {date_str} from {session_dir}")
+    print(f"[INFO] Found {total} sessions for {date_str} in {session_dir}")
 
     if total == 0:
         print(f"[INFO] No sessions to process for {date_str}.")
         return
 
     model = make_model()
-
+    manifest = RunManifest(output_dir / date_str)
+    if retry_failed:
+        retry_ids = set(manifest.failed())
+        print(f"[INFO] Retrying {len(retry_ids)} failed sessions")
+    limiter = RateLimiter(rpm, tpm)
+    cache = ResponseCache() if use_cache else None
+    if cache:
+        evicted = cache.evict()
+        if evicted:
+            print(f"[INFO] Evicted {evicted} expired/oversize cache entries")
+
+    representatives: Dict[str, str] = {}
+    if dedup != "off":
+        representatives = cluster_sessions(iter_sessions_for_day(session_dir, date_str), near=dedup == "near")
+        sizes = cluster_sizes(representatives)
+        print(f"[INFO] {len(representatives)} sessions in {len(sizes)} clusters ({dedup} dedup)")
+    # Analyses of representatives with other members, for the fan-out
+    rep_results: Dict[str, Dict[str, Any]] = {}
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
     processed = 0
-    for idx, session in enumerate(sessions, start=1):
+    failed = 0
+    skipped = 0
+    fanned_out = 0
+    done = 0
+
+    # Representatives that go through batch requests, for their members' hashes
+    batch_reps = set()
+
+    def pending(idx: int, session: Dict[str, Any], batched: bool) -> Optional[Tuple[str, List[Any], str]]:
+        """
+        (session_id, messages, input_hash) if the session must be (re)done.
+        The input hash of a `batched` session is over the batch prompt, so
+        results from batch and single-call runs never stand in for each other.
+        """
         session_id = session.get("session_id", f"session_{idx}")
-
-        print(f"[AI-L1] Processing session {idx}/{total}: {session_id} ...")
-
-        try:
-            analysis = analyze_single_session(model, session)
-            save_analysis(output_dir, date_str, session, analysis)
-            processed += 1
-        except Exception as e:
-            print(f"[WARN] Failed to analyze session {session_id}: {e}")
-
-    print(f"[INFO] AI Layer 1 completed for {date_str}: {processed}/{total} sessions processed.")
+        if retry_failed and session_id not in retry_ids:
+            return None
+        messages = build_messages(session)
+        prompt_key = batch_cache_key(model, session) if batched else model_cache_key(model, messages)
+        input_hash = session_input_hash(session, prompt_key)
+        if manifest.is_done(session_id, input_hash, output_dir):
+            return None
+        return session_id, messages, input_hash
+
+    async def worker() -> None:
+        nonlocal processed, failed, done
+        while True:
+            items = await queue.get()
+            if items is None:
+                return
+            batched: Dict[str, Dict[str, Any]] = {}
+            if len(items) > 1:
+                batched = await analyze_batch_async(model, [session for _, session, _, _ in items], limiter, cache)
+            for session_id, session, messages, input_hash in items:
+                try:
+                    analysis = batched.get(session_id)
+                    if analysis is None:
+                        analysis = await analyze_session_async(model, session, limiter, cache, messages=messages)
+                    if representatives and sizes.get(session_id, 1) > 1:
+                        rep_results[session_id] = analysis
+                    target = save_analysis(output_dir, date_str, session, analysis)
+                    manifest.record(session_id, DONE, input_hash, output=str(target.relative_to(output_dir)))
+                    processed += 1
+                except Exception as e:
+                    print(f"[WARN] Failed to analyze session {session_id}: {e}")
+                    manifest.record(session_id, FAILED, input_hash, error=f"{type(e).__name__}: {e}")
+                    failed += 1
+                done += 1
+                print(f"[AI-L1] {done}/{total} done: {session_id}")
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    pack: List[Tuple[str, Dict[str, Any], List[Any], str]] = []
+    pack_tokens = 0
+    for idx, session in enumerate(iter_sessions_for_day(session_dir, date_str), start=1):
+        sid = session.get("session_id")
+        if representative_of(representatives, sid) != sid:
+            continue  # cluster member, filled in below
+        batched = batch and fits_batch(session)
+        if batched:
+            batch_reps.add(sid)
+        todo = pending(idx, session, batched)
+        if todo is None:
+            skipped += 1
+            done += 1
+            continue
+        session_id, messages, input_hash = todo
+        item = (session_id, session, messages, input_hash)
+        if not batched:
+            await queue.put([item])
+            continue
+        # Only the digest is added per session; the system prompt is paid once
+        tokens = estimate_tokens(messages[1].content)
+        if pack and (len(pack) >= LAYER1_BATCH_SIZE or pack_tokens + tokens > LAYER1_BATCH_TOKENS):
+            await queue.put(pack)
+            pack, pack_tokens = [], 0
+        pack.append(item)
+        pack_tokens += tokens
+    if pack:
+        await queue.put(pack)
+    for _ in workers:
+        await queue.put(None)
+    await asyncio.gather(*workers)
+
+    if representatives:
+        # Fan the representatives' analyses out to the rest of their clusters
+        for idx, session in enumerate(iter_sessions_for_day(session_dir, date_str), start=1):
+            rep_id = representative_of(representatives, session.get("session_id"))
+            if rep_id == session.get("session_id"):
+                continue
+            todo = pending(idx, session, rep_id in batch_reps)
+            done += 1
+            if todo is None:
+                skipped += 1
+                continue
+            session_id, _, input_hash = todo
+            rep_analysis = rep_results.get(rep_id)
+            if rep_analysis is None:
+                entry = manifest.get(rep_id)
+                if entry and entry["status"] == DONE:
+                    with (output_dir / entry["output"]).open("r", encoding="utf-8") as f:
+                        rep_analysis = json.load(f)
+            if rep_analysis is None:
+                manifest.record(session_id, FAILED, input_hash, error=f"representative {rep_id} not analyzed")
+                failed += 1
+                continue
+            target = save_analysis(output_dir, date_str, session, fan_out_analysis(session, rep_analysis))
+            manifest.record(session_id, DONE, input_hash, output=str(target.relative_to(output_dir)))
+            fanned_out += 1
+    manifest.close()
+
+    print(f"[INFO] AI Layer 1 completed for {date_str}: {processed} processed, {fanned_out} from duplicates, "
+          f"{failed} failed, {skipped} skipped of {total} sessions.")
+    print(f"[INFO] {limiter.requests} model requests, {limiter.used_tokens} tokens")
+    if failed:
+        print(f"[INFO] Rerun with --retry-failed to retry only the {failed} failures "
+              f"(see {manifest.path})")
+    if cache:
+        stats = cache.stats()
+        print(f"[INFO] Response cache: {stats['hits']} hits, {stats['misses']} misses, "
+              f"{stats['entries']} entries ({stats['mb']:.1f} MB)")
+        cache.close()
 
 
 if __name__ == "__main__":
-    import sys
-
-    if len(sys.argv) != 2:
-        print("Usage: python ai/layer1/analyze_session.py <YYYY-MM-DD>")
-        sys.exit(1)
-
-    date_arg = sys.argv[1]
-    run_layer1_for_date(date_arg)
+    parser = argparse.ArgumentParser(description="Run AI Layer 1 over the sessions of one day.")
+    parser.add_argument("date", help="Day to analyze (YYYY-MM-DD).")
+    parser.add_argument("--concurrency", type=int, default=LAYER1_CONCURRENCY,
+                        help="Model calls in flight at once.")
+    parser.add_argument("--rpm", type=int, default=LAYER1_RPM, help="Requests per minute (0 = unlimited).")
+    parser.add_argument("--tpm", type=int, default=LAYER1_TPM, help="Tokens per minute (0 = unlimited).")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Bypass the response cache: call the model for every session and store nothing.")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="Only re-run the sessions whose last attempt failed (per the day's manifest).")
+    parser.add_argument("--dedup", choices=("off", "exact", "near"), default=LAYER1_DEDUP,
+                        help="Analyze one session per cluster of identical (exact) or near-identical (near) sessions.")
+    parser.add_argument("--batch", action="store_true",
+                        help="Pack small sessions several to a request (TPOT_AI_LAYER1_BATCH_*).")
+    args = parser.parse_args()
+
+    run_layer1_for_date(args.date, args.concurrency, args.rpm, args.tpm,
+                        use_cache=not args.no_cache, retry_failed=args.retry_failed, dedup=args.dedup,
+                        batch=args.batch)
@@ -0,0 +1,146 @@
+# cache.py
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+LAYER1_DIR = os.getenv("TPOT_AI_LAYER1_DIR", "/data/tpot_sessions/ai_layer1")
+CACHE_PATH = os.getenv("TPOT_AI_LAYER1_CACHE", os.path.join(LAYER1_DIR, ".cache.sqlite"))
+# Entries older than this are dropped (0 = keep forever)
+CACHE_MAX_AGE_DAYS = float(os.getenv("TPOT_AI_LAYER1_CACHE_MAX_AGE_DAYS", "90"))
+# Total size of cached responses; least recently used go first (0 = unbounded)
+CACHE_MAX_MB = float(os.getenv("TPOT_AI_LAYER1_CACHE_MAX_MB", "512"))
+
+
+def cache_key(model_name: str, temperature: float, messages: List[Any]) -> str:
+    """
+    sha256 over the model, its temperature and the exact prompt text
+    (system prompt, and user prompt with the session digest). Anything
+    computed after the call, like key_indicators, is not part of it.
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps([model_name, temperature]).encode("utf-8"))
+    for message in messages:
+        h.update(b"\0")
+        h.update(message.type.encode("utf-8"))
+        h.update(b"\0")
+        h.update(message.content.encode("utf-8"))
+    return h.hexdigest()
+
+
+class ResponseCache:
+    """
+    Parsed Layer 1 model outputs in SQLite, keyed by cache_key(). Counts
+    hits and misses for the run; evict() applies the age and size limits.
+    """
+
+    def __init__(
+        self,
+        path: str = CACHE_PATH,
+        max_age_days: float = CACHE_MAX_AGE_DAYS,
+        max_mb: float = CACHE_MAX_MB,
+    ):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_age_days = max_age_days
+        self.max_mb = max_mb
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None or (self.max_age_days and now - row[1] > self.max_age_days * 86400):
+            self.misses += 1
+            return None
+        self.conn.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+        self.conn.commit()
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        data = json.dumps(value)
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO responses (key, value, size, created_at, used_at) VALUES (?, ?, ?, ?, ?)",
+            (key, data, len(data), now, now),
+        )
+        self.conn.commit()
+
+    def evict(self) -> int:
+        """Drop expired entries, then least recently used ones over the size limit."""
+        removed = 0
+        if self.max_age_days:
+            cutoff = time.time() - self.max_age_days * 86400
+            removed += self.conn.execute("DELETE FROM responses WHERE created_at < ?", (cutoff,)).rowcount
+        if self.max_mb:
+            limit = int(self.max_mb * 1024 * 1024)
+            total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > limit:
+                doomed = []
+                for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY used_at"):
+                    if total <= limit:
+                        break
+                    doomed.append((key,))
+                    total -= size
+                self.conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+                removed += len(doomed)
+        self.conn.commit()
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        entries, size, oldest = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), MIN(created_at) FROM responses"
+        ).fetchone()
+        return {
+            "entries": entries,
+            "mb": size / 1024 / 1024,
+            "oldest_days": (time.time() - oldest) / 86400 if oldest else 0.0,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or trim the Layer 1 response cache.")
+    parser.add_argument("--evict", action="store_true", help="Apply the age and size limits now.")
+    parser.add_argument("--clear", action="store_true", help="Remove every entry.")
+    args = parser.parse_args()
+
+    cache = ResponseCache()
+    if args.clear:
+        cache.conn.execute("DELETE FROM responses")
+        cache.conn.commit()
+    if args.evict:
+        print(f"[INFO] Evicted {cache.evict()} entries")
+    stats = cache.stats()
+    print(f"[INFO] {cache.path}: {stats['entries']} entries, {stats['mb']:.1f} MB, "
+          f"oldest {stats['oldest_days']:.1f} days")
+    cache.close()
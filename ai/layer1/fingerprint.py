@@ -0,0 +1,182 @@
+# fingerprint.py
+
+import hashlib
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+# MinHash signature length and LSH banding (BANDS * ROWS == NUM_PERM)
+NUM_PERM = 64
+BANDS = 16
+ROWS = 4
+# Estimated Jaccard similarity at or above which sessions are clustered
+NEAR_THRESHOLD = 0.9
+
+IPV4_RE = re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}\b")
+LOGIN_RE = re.compile(r"\[(.*)\]")
+
+_MERSENNE = (1 << 61) - 1
+
+
+def mask_ips(text: str) -> str:
+    return IPV4_RE.sub("<ip>", text)
+
+
+def event_token(sensor: str, event: Dict[str, Any]) -> str:
+    """
+    What one event contributes to a session's fingerprint: the attacker's
+    actions, without the IPs, ports, timestamps and ids that differ
+    between otherwise identical sessions.
+    """
+    raw = event.get("raw") or {}
+    url = event.get("url") or raw.get("url")
+    url = mask_ips(url) if url else ""
+
+    if sensor == "Cowrie":
+        eventid = event.get("eventid") or ""
+        if eventid == "cowrie.command.input":
+            command = raw.get("input") or (event.get("message") or "").replace("CMD: ", "", 1)
+            return f"{eventid}|{mask_ips(command.strip())}"
+        if eventid.startswith("cowrie.login."):
+            if raw.get("username") is not None:
+                return f"{eventid}|{raw.get('username')}/{raw.get('password')}"
+            match = LOGIN_RE.search(event.get("message") or "")
+            return f"{eventid}|{match.group(1) if match else ''}"
+        # connect/closed/client/kex messages only carry addresses and durations
+        return f"{eventid}|{url}"
+
+    connection = event.get("connection") or {}
+    return "|".join(
+        str(part) for part in (
+            event.get("protocol") or "",
+            event.get("dest_port") or "",
+            connection.get("type") or "",
+            event.get("eventid") or event.get("event_type") or "",
+            url,
+        )
+    )
+
+
+def canonical_tokens(session: Dict[str, Any]) -> List[str]:
+    sensor = session.get("sensor", "")
+    return [event_token(sensor, event) for event in session.get("events", [])]
+
+
+def session_fingerprint(session: Dict[str, Any]) -> str:
+    """sha256 of the sensor and the canonical event sequence."""
+    payload = json.dumps([session.get("sensor", ""), canonical_tokens(session)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _hash64(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+_PERMUTATIONS = [
+    (_hash64(f"a{i}") % (_MERSENNE - 1) + 1, _hash64(f"b{i}") % _MERSENNE)
+    for i in range(NUM_PERM)
+]
+
+
+def minhash(session: Dict[str, Any]) -> Tuple[int, ...]:
+    """
+    MinHash signature over the session's distinct event tokens and token
+    bigrams, so sessions repeating the same steps a different number of
+    times (e.g. more login attempts) still come out similar.
+    """
+    tokens = [session.get("sensor", "")] + canonical_tokens(session)
+    shingles = set(tokens) | {f"{a}\n{b}" for a, b in zip(tokens, tokens[1:])}
+    values = [_hash64(s) for s in shingles]
+    return tuple(
+        min((a * x + b) % _MERSENNE for x in values)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def similarity(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+
+def cluster_sessions(
+    sessions: Iterable[Dict[str, Any]],
+    near: bool = False,
+    threshold: float = NEAR_THRESHOLD,
+) -> Dict[str, str]:
+    """
+    session_id -> session_id of its cluster's representative (itself for
+    representatives). Sessions with the same fingerprint always share a
+    cluster; with `near`, clusters whose MinHash signatures are at least
+    `threshold` similar are merged too. The representative is the first
+    session of the cluster in input order.
+    """
+    order: Dict[str, int] = {}
+    exact: Dict[str, str] = {}         # fingerprint -> first session_id
+    parent: Dict[str, str] = {}
+    signatures: Dict[str, Tuple[int, ...]] = {}
+
+    for session in sessions:
+        session_id = session["session_id"]
+        order.setdefault(session_id, len(order))
+        fingerprint = session_fingerprint(session)
+        first = exact.setdefault(fingerprint, session_id)
+        parent[session_id] = first
+        if near and first == session_id:
+            signatures[session_id] = minhash(session)
+
+    def find(sid: str) -> str:
+        while parent[sid] != sid:
+            parent[sid] = parent[parent[sid]]
+            sid = parent[sid]
+        return sid
+
+    def union(a: str, b: str) -> None:
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            if order[rb] < order[ra]:
+                ra, rb = rb, ra
+            parent[rb] = ra
+
+    if near:
+        buckets: Dict[Tuple[int, Tuple[int, ...]], List[str]] = {}
+        for sid, sig in signatures.items():
+            for band in range(BANDS):
+                key = (band, sig[band * ROWS:(band + 1) * ROWS])
+                buckets.setdefault(key, []).append(sid)
+        for members in buckets.values():
+            # Compare each candidate with one anchor per cluster seen in the bucket
+            anchors: List[str] = []
+            for sid in members:
+                for anchor in anchors:
+                    if find(anchor) == find(sid):
+                        break
+                    if similarity(signatures[anchor], signatures[sid]) >= threshold:
+                        union(anchor, sid)
+                        break
+                else:
+                    anchors.append(sid)
+
+    return {sid: find(sid) for sid in parent}
+
+
+def cluster_sizes(representatives: Dict[str, str]) -> Dict[str, int]:
+    sizes: Dict[str, int] = {}
+    for rep in representatives.values():
+        sizes[rep] = sizes.get(rep, 0) + 1
+    return sizes
+
+
+def fan_out_fields(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The part of a representative's analysis that carries over to the
+    other sessions of its cluster; ids, timestamps and key_indicators are
+    always the session's own.
+    """
+    own = ("session_id", "sensor", "key_indicators", "timestamp_range", "duplicate_of")
+    return {k: v for k, v in analysis.items() if k not in own}
+
+
+def representative_of(representatives: Optional[Dict[str, str]], session_id: str) -> str:
+    if not representatives:
+        return session_id
+    return representatives.get(session_id, session_id)
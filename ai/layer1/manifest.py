@@ -0,0 +1,103 @@
+# manifest.py
+
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+MANIFEST_NAME = "manifest.ndjson"
+
+DONE = "done"
+FAILED = "failed"
+
+
+def session_input_hash(session: Dict[str, Any], prompt_key: str) -> str:
+    """
+    What a session's analysis depends on: its full content (key_indicators
+    read every event, not just the digest) and the prompt/model (see
+    cache.cache_key).
+    """
+    h = hashlib.sha256(prompt_key.encode("utf-8"))
+    h.update(json.dumps(session, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+class RunManifest:
+    """
+    Per-day Layer 1 progress: one line per attempt outcome appended to
+    <TPOT_AI_LAYER1_DIR>/<date>/manifest.ndjson, the last line of a
+    session wins. Each record holds session_id, status (done|failed),
+    input_hash, attempts, error, output and updated_at. Appending a line
+    per session keeps a crash from losing more than the calls in flight.
+    """
+
+    def __init__(self, day_dir: Path):
+        day_dir.mkdir(parents=True, exist_ok=True)
+        self.path = day_dir / MANIFEST_NAME
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            with self.path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn last line of a crashed run
+                    self.entries[entry["session_id"]] = entry
+        if self.path.exists() and self.path.stat().st_size:
+            with self.path.open("rb") as f:
+                f.seek(-1, 2)
+                torn = f.read(1) != b"\n"
+        else:
+            torn = False
+        self.out = self.path.open("a", encoding="utf-8")
+        if torn:
+            self.out.write("\n")
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(session_id)
+
+    def is_done(self, session_id: str, input_hash: str, base_dir: Path) -> bool:
+        entry = self.entries.get(session_id)
+        return (
+            entry is not None
+            and entry["status"] == DONE
+            and entry["input_hash"] == input_hash
+            and (base_dir / entry["output"]).exists()
+        )
+
+    def failed(self) -> Dict[str, Dict[str, Any]]:
+        return {sid: e for sid, e in self.entries.items() if e["status"] == FAILED}
+
+    def record(
+        self,
+        session_id: str,
+        status: str,
+        input_hash: str,
+        output: Optional[str] = None,
+        error: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        previous = self.entries.get(session_id)
+        entry = {
+            "session_id": session_id,
+            "status": status,
+            "input_hash": input_hash,
+            "attempts": (previous["attempts"] if previous else 0) + 1,
+            "error": error,
+            "output": output,
+            "updated_at": time.time(),
+        }
+        self.entries[session_id] = entry
+        self.out.write(json.dumps(entry) + "\n")
+        self.out.flush()
+        return entry
+
+    def counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for entry in self.entries.values():
+            counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+        return counts
+
+    def close(self) -> None:
+        self.out.close()
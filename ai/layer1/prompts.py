@@ -1,6 +1,6 @@
 # prompts.py
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 from textwrap import dedent
 
 
@@ -117,3 +117,32 @@ def build_layer1_user_prompt(session_digest: str) -> str:
     """
 
     return f"Here is the honeypot session you must analyze:\n\n{session_digest}\n\nReturn only the JSON object as specified."
+
+
+def build_layer1_batch_system_prompt() -> str:
+    """
+    The single-session prompt, plus how to answer for several sessions at
+    once. Identical for every batch.
+    """
+
+    batch = dedent(
+        """
+        Batch mode:
+        - The message contains several independent sessions, each introduced by a line "=== SESSION <session_id> ===".
+        - Analyze every session on its own, exactly as described above. Never carry evidence from one session over to another.
+        - Instead of a single JSON object, return a JSON array with exactly one object per session, each following the structure above, with "session_id" set to the id of the session it describes.
+        """
+    ).strip()
+    return build_layer1_system_prompt() + "\n\n" + batch
+
+
+def build_layer1_batch_user_prompt(session_digests: List[Tuple[str, str]]) -> str:
+    """
+    Human message with several (session_id, digest) pairs for batch mode.
+    """
+
+    parts = [f"Here are the {len(session_digests)} honeypot sessions you must analyze:"]
+    for session_id, digest in session_digests:
+        parts.append(f"=== SESSION {session_id} ===\n{digest}")
+    parts.append(f"Return only the JSON array of {len(session_digests)} objects as specified.")
+    return "\n\n".join(parts)
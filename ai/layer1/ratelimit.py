@@ -0,0 +1,109 @@
+# ratelimit.py
+
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Deque, List, Optional
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count (about 4 characters per token for English/JSON).
+    Only used to keep under a tokens-per-minute limit before the real
+    usage is known.
+    """
+    return len(text) // 4 + 1
+
+
+class RateLimiter:
+    """
+    Sliding one-minute window over requests and tokens, shared by every
+    concurrent Layer 1 call. acquire() waits until one more request of
+    `tokens` fits under both limits (0 = unlimited); settle() replaces the
+    estimate with the real usage once the response is in. pause() holds
+    every caller back, e.g. after a 429. `requests` and `used_tokens`
+    total what went through it (estimates where no usage was reported).
+    """
+
+    WINDOW = 60.0
+
+    def __init__(self, rpm: int = 0, tpm: int = 0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.calls: Deque[List[Any]] = deque()  # [started, tokens]
+        self.tokens = 0
+        self.paused_until = 0.0
+        self.lock = asyncio.Lock()
+        self.requests = 0
+        self.used_tokens = 0
+
+    def _prune(self, now: float) -> None:
+        while self.calls and now - self.calls[0][0] >= self.WINDOW:
+            self.tokens -= self.calls.popleft()[1]
+
+    def _wait_time(self, now: float, tokens: int) -> float:
+        wait = max(0.0, self.paused_until - now)
+        if self.rpm and len(self.calls) >= self.rpm:
+            wait = max(wait, self.calls[0][0] + self.WINDOW - now)
+        if self.tpm and self.calls and self.tokens + tokens > self.tpm:
+            # Wait until enough of the oldest calls leave the window
+            freed = 0
+            for started, used in self.calls:
+                freed += used
+                if self.tokens - freed + tokens <= self.tpm:
+                    break
+            wait = max(wait, started + self.WINDOW - now)
+        return wait
+
+    async def acquire(self, tokens: int) -> List[Any]:
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self._prune(now)
+                wait = self._wait_time(now, tokens)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            ticket = [now, tokens]
+            self.calls.append(ticket)
+            self.tokens += tokens
+            self.requests += 1
+            return ticket
+
+    def settle(self, ticket: List[Any], tokens: Optional[int]) -> None:
+        if tokens is None:
+            self.used_tokens += ticket[1]
+            return
+        self.used_tokens += tokens
+        if any(call is ticket for call in self.calls):
+            self.tokens += tokens - ticket[1]
+        ticket[1] = tokens
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """openai.RateLimitError and anything else carrying HTTP 429."""
+    if type(error).__name__ == "RateLimitError":
+        return True
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429
+
+
+def retry_after(error: BaseException, attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """
+    Seconds to wait before retrying: the server's Retry-After when given,
+    otherwise exponential backoff with full jitter.
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    value = headers.get("retry-after") if hasattr(headers, "get") else None
+    if value is not None:
+        try:
+            return min(cap, float(value))
+        except ValueError:
+            pass
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
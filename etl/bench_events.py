@@ -0,0 +1,99 @@
+"""
+Memory of a day of normalized Cowrie events: plain dicts vs events.Event.
+
+Generates a Cowrie day with the T-Pot stand-in, normalizes it to NDJSON
+lines (as sessionize reads them) and measures what holding the whole day
+costs in each representation, plus the time to load and sessionize it:
+
+    python etl/bench_events.py --docs 500000
+    python etl/bench_events.py --docs 500000 --raw-ref
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from events import Event  # noqa: E402
+from normalize import NORMALIZERS, RAW_REF_FIELDS  # noqa: E402
+from sessionize import sessionize_cowrie  # noqa: E402
+from tpot_standin import DayIndex  # noqa: E402
+
+
+def cowrie_lines(docs, raw_ref, seed):
+    """Normalized Cowrie events of one stand-in day, serialized."""
+    day = DayIndex("logstash-2025.11.11", datetime(2025, 11, 11), docs, seed)
+    normalize = NORMALIZERS["Cowrie"][1]
+    lines = []
+    offset = 0
+    for pos in range(docs):
+        src = day.source(pos)
+        if src["type"] != "Cowrie":
+            continue
+        event = normalize(src)
+        if raw_ref:
+            event["raw"] = {k: src[k] for k in RAW_REF_FIELDS if k in src}
+            event["raw_ref"] = {"file": "tpot_raw_bench.ndjson", "offset": offset, "length": 900, "id": str(pos)}
+            offset += 900
+        lines.append(json.dumps(event))
+    return lines
+
+
+def measure(name, load, lines):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    events = load(lines)
+    load_seconds = time.perf_counter() - started
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    sessions = sessionize_cowrie(events)
+    sessionize_seconds = time.perf_counter() - started
+
+    result = {
+        "variant": name,
+        "events": len(events),
+        "sessions": len(sessions),
+        "mb": held / 1e6,
+        "bytes_per_event": held / len(events) if events else 0,
+        "load_seconds": load_seconds,
+        "sessionize_seconds": sessionize_seconds,
+    }
+    del events, sessions
+    gc.collect()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark in-memory event representations.")
+    parser.add_argument("--docs", type=int, default=200_000, help="Stand-in documents (about half are Cowrie).")
+    parser.add_argument("--raw-ref", action="store_true", help="Events as written by normalize --raw-ref.")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    lines = cowrie_lines(args.docs, args.raw_ref, args.seed)
+
+    variants = [
+        ("dict", lambda ls: [json.loads(line) for line in ls]),
+        ("Event", lambda ls: [Event.from_dict(json.loads(line)) for line in ls]),
+    ]
+    results = [measure(name, load, lines) for name, load in variants]
+
+    print(f"{len(lines)} Cowrie events{' (raw-ref)' if args.raw_ref else ''}")
+    print(f"{'variant':<8} {'events':>9} {'sessions':>9} {'held MB':>9} {'B/event':>9} {'load s':>8} {'sessionize s':>13}")
+    for r in results:
+        print(f"{r['variant']:<8} {r['events']:>9} {r['sessions']:>9} {r['mb']:>9.1f} "
+              f"{r['bytes_per_event']:>9.0f} {r['load_seconds']:>8.2f} {r['sessionize_seconds']:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
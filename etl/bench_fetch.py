@@ -0,0 +1,165 @@
+"""
+Fetch throughput benchmark against the local T-Pot stand-in.
+
+Starts etl/tpot_standin.py in a child process, points the fetcher at it
+and reports docs/sec and memory for each fetch mode:
+
+    python etl/bench_fetch.py --docs 200000 --latency-ms 20
+
+Memory is the Python-level peak from tracemalloc (what the fetch path
+itself holds) plus the process max RSS.
+"""
+
+import argparse
+import gzip
+import importlib
+import json
+import os
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BENCH_DAY = "2025-11-11"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"stand-in did not come up on port {port}")
+
+
+def count_hits(raw_dir):
+    total = 0
+    for name in os.listdir(raw_dir):
+        path = os.path.join(raw_dir, name)
+        if name.endswith(".json"):
+            # Legacy single-query mode writes one indented JSON array
+            with open(path) as f:
+                total += len(json.load(f))
+            continue
+        opener = gzip.open if name.endswith(".gz") else open
+        with opener(path, "rb") as f:
+            total += sum(1 for _ in f)
+    return total
+
+
+def raw_bytes(raw_dir):
+    return sum(os.path.getsize(os.path.join(raw_dir, n)) for n in os.listdir(raw_dir))
+
+
+def run_mode(name, call, raw_dir):
+    for entry in os.listdir(raw_dir):
+        os.remove(os.path.join(raw_dir, entry))
+
+    tracemalloc.start()
+    started = time.monotonic()
+    call()
+    elapsed = time.monotonic() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    docs = count_hits(raw_dir)
+
+    return {
+        "mode": name,
+        "docs": docs,
+        "seconds": elapsed,
+        "docs_per_sec": docs / elapsed if elapsed else 0.0,
+        "peak_mb": peak / 1e6,
+        "raw_mb": raw_bytes(raw_dir) / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark etl/fetcher.py against the local stand-in.")
+    parser.add_argument("--docs", type=int, default=100_000, help="Documents in the benchmark day.")
+    parser.add_argument("--latency-ms", type=float, default=10.0, help="Per-request latency injected by the stand-in.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests the stand-in fails with 503.")
+    parser.add_argument("--page-size", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--host-concurrency", type=int, default=4)
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        default=["single-query", "sequential", "parallel", "parallel-full"],
+        choices=["single-query", "sequential", "parallel", "parallel-full"],
+    )
+    args = parser.parse_args()
+
+    port = free_port()
+    raw_dir = tempfile.mkdtemp(prefix="tpot_bench_raw_")
+
+    server = subprocess.Popen(
+        [
+            sys.executable, os.path.join(HERE, "tpot_standin.py"),
+            "--port", str(port),
+            "--docs", str(args.docs),
+            "--days", BENCH_DAY,
+            "--latency-ms", str(args.latency_ms),
+            "--error-rate", str(args.error_rate),
+        ],
+        stdout=subprocess.DEVNULL,
+    )
+
+    try:
+        wait_for_port(port)
+
+        # The fetcher reads its configuration from the environment at import
+        os.environ.update({
+            "TPOT_HOST": f"http://127.0.0.1:{port}",
+            "TPOT_INDEX": "logstash-" + BENCH_DAY.replace("-", "."),
+            "TPOT_RAW_DIR": raw_dir,
+            "TPOT_PAGE_SIZE": str(args.page_size),
+            "TPOT_HOST_CONCURRENCY": str(args.host_concurrency),
+            "TPOT_FETCH_BACKOFF": "0.05",
+        })
+        sys.path.insert(0, HERE)
+        fetcher = importlib.import_module("fetcher")
+        sensors = fetcher.HONEYPOT_SENSORS
+
+        calls = {
+            "single-query": lambda: fetcher.fetch("bench", sensors),
+            "sequential": lambda: fetcher.fetch_paged("bench", sensors),
+            "parallel": lambda: fetcher.fetch_parallel("bench", sensors, workers=args.workers),
+            "parallel-full": lambda: fetcher.fetch_parallel(
+                "bench", sensors, workers=args.workers,
+                full_source=True, keep_fields=True, compress=False,
+            ),
+        }
+
+        results = [run_mode(m, calls[m], raw_dir) for m in args.modes]
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(raw_dir, ignore_errors=True)
+
+    print()
+    print(f"{args.docs} docs, {args.latency_ms:.0f} ms latency, page size {args.page_size}, "
+          f"{args.workers} workers / {args.host_concurrency} connections")
+    print(f"{'mode':<14} {'docs':>9} {'seconds':>9} {'docs/s':>10} {'peak MB':>9} {'raw MB':>9}")
+    for r in results:
+        print(f"{r['mode']:<14} {r['docs']:>9} {r['seconds']:>9.2f} {r['docs_per_sec']:>10.0f} "
+              f"{r['peak_mb']:>9.1f} {r['raw_mb']:>9.1f}")
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"max RSS of benchmark process: {rss:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
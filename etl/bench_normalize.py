@@ -0,0 +1,170 @@
+"""
+Per-event normalize cost: registry dispatch vs the old if/elif chain.
+
+Builds hits from the T-Pot stand-in generator (plus a share of other
+sensor types when --other-share is set) and times process_hits against
+an inline copy of the hand-written normalizers it replaced. The
+registry side also parses `ts_us` once per event, which the old
+normalizers left to sessionize:
+
+    python etl/bench_normalize.py --docs 200000 --other-share 0.3
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+import normalize  # noqa: E402
+from tpot_standin import DayIndex  # noqa: E402
+
+
+# -----------------------------
+# Baseline: the hand-written normalizers + if/elif dispatch
+# -----------------------------
+
+def legacy_cowrie(src):
+    return {
+        "timestamp": src.get("@timestamp") or src.get("timestamp"),
+        "sensor": "Cowrie",
+        "session_id": src.get("session"),
+        "src_ip": src.get("src_ip"),
+        "src_port": src.get("src_port"),
+        "dest_ip": src.get("dest_ip") or src.get("t-pot_ip_int") or src.get("t-pot_ip_ext"),
+        "dest_port": src.get("dest_port"),
+        "protocol": src.get("protocol"),
+        "eventid": src.get("eventid"),
+        "message": src.get("message"),
+        "url": None,
+        "connection": None,
+        "event_type": None,
+        "raw": src,
+    }
+
+
+def legacy_wordpot(src):
+    return {
+        "timestamp": src.get("@timestamp") or src.get("timestamp"),
+        "sensor": "Wordpot",
+        "session_id": None,
+        "src_ip": src.get("src_ip"),
+        "src_port": src.get("src_port"),
+        "dest_ip": src.get("t-pot_ip_int") or src.get("dest_ip"),
+        "dest_port": src.get("dest_port"),
+        "protocol": "http",
+        "eventid": None,
+        "message": None,
+        "url": src.get("url"),
+        "connection": None,
+        "event_type": None,
+        "raw": src,
+    }
+
+
+def legacy_dionaea(src):
+    conn = src.get("connection") or {}
+    return {
+        "timestamp": src.get("@timestamp") or src.get("timestamp"),
+        "sensor": "Dionaea",
+        "session_id": None,
+        "src_ip": src.get("src_ip"),
+        "src_port": src.get("src_port"),
+        "dest_ip": src.get("dest_ip") or src.get("t-pot_ip_int"),
+        "dest_port": src.get("dest_port"),
+        "protocol": conn.get("protocol"),
+        "eventid": None,
+        "message": None,
+        "url": None,
+        "connection": conn,
+        "event_type": None,
+        "raw": src,
+    }
+
+
+def legacy_date(ts):
+    # ts example: "2025-11-11T13:36:46.602Z"
+    if not ts:
+        return "unknown"
+    if "T" in ts:
+        return ts.split("T")[0]
+    return ts[:10]
+
+
+def legacy_process_hits(hits, out_dict):
+    for hit in hits:
+        src = hit.get("_source", {})
+        sensor_type = src.get("type")
+        if not sensor_type:
+            continue
+        if sensor_type == "Cowrie":
+            norm = legacy_cowrie(src)
+            key = "cowrie"
+        elif sensor_type == "Wordpot":
+            norm = legacy_wordpot(src)
+            key = "wordpot"
+        elif sensor_type == "Dionaea":
+            norm = legacy_dionaea(src)
+            key = "dionaea"
+        else:
+            continue
+        date_str = legacy_date(norm["timestamp"])
+        out_dict.setdefault(date_str, {}).setdefault(key, []).append(norm)
+
+
+# -----------------------------
+# Input
+# -----------------------------
+
+def make_hits(docs, other_share, seed):
+    day = DayIndex("logstash-2025.11.11", datetime(2025, 11, 11), docs, seed)
+    others = [t for t in normalize.NORMALIZERS if t not in ("Cowrie", "Wordpot", "Dionaea")]
+    rng = random.Random(seed)
+
+    hits = []
+    for pos in range(docs):
+        src = day.source(pos)
+        if others and rng.random() < other_share:
+            src = dict(src, type=rng.choice(others))
+        hits.append({"_id": f"bench-{pos}", "_source": src})
+    return hits
+
+
+def time_call(func, hits, repeat):
+    best = None
+    for _ in range(repeat):
+        out = {}
+        started = time.perf_counter()
+        func(hits, out)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    kept = sum(len(v) for day in out.values() for v in day.values())
+    return best, kept
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark normalizer dispatch.")
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--other-share", type=float, default=0.0,
+                        help="Fraction of hits re-typed to sensors outside Cowrie/Wordpot/Dionaea.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per variant; the best is reported.")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    hits = make_hits(args.docs, args.other_share, args.seed)
+
+    print(f"{args.docs} hits, {args.other_share:.0%} other sensor types, "
+          f"{len(normalize.NORMALIZERS)} registered normalizers")
+    print(f"{'variant':<10} {'kept':>9} {'seconds':>9} {'us/event':>9} {'events/s':>10}")
+    for name, func in (("if/elif", legacy_process_hits), ("registry", normalize.process_hits)):
+        seconds, kept = time_call(func, hits, args.repeat)
+        print(f"{name:<10} {kept:>9} {seconds:>9.3f} {seconds / len(hits) * 1e6:>9.2f} "
+              f"{len(hits) / seconds:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Windowed sessionization cost: python vs numpy engine.
+
+Generates a synthetic Dionaea day (bursts of connections from many
+sources with idle gaps in between), sessionizes it with both engines,
+checks that the output is identical and reports the split time and the
+end-to-end time (split, caps, wrap_session and JSON encoding, as
+sessionize_unit writes them). Output is hashed rather than kept, so the
+engine that runs second does not pay for garbage collection over the
+first one's sessions:
+
+    python etl/bench_sessionize.py --events 2000000
+    python etl/bench_sessionize.py --events 2000000 --key src_ip --max-events 10000
+"""
+
+import argparse
+import gc
+import hashlib
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from events import Event  # noqa: E402
+from sessionize import cap_sessions, encode_session, sessionize_dionaea, wrap_session  # noqa: E402
+
+DAY = datetime(2025, 11, 11, tzinfo=timezone.utc)
+
+
+def dionaea_day(count, bursts, seed, sources=5000):
+    """Events in `bursts` clusters spread over the day, in random order."""
+    rng = random.Random(seed)
+    pool = [f"10.{n // 65536 % 256}.{n // 256 % 256}.{n % 256}" for n in range(sources)]
+    day_us = 86400 * 1_000_000
+    centers = sorted(rng.randrange(day_us) for _ in range(bursts))
+    events = []
+    for n in range(count):
+        offset = rng.choice(centers) + int(rng.expovariate(1 / 120e6))
+        offset = min(offset, day_us - 1)
+        ts = DAY + timedelta(microseconds=offset)
+        events.append(Event.from_dict({
+            "timestamp": ts.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z",
+            "ts_us": int(ts.timestamp()) * 1_000_000 + ts.microsecond,
+            "sensor": "Dionaea",
+            "src_ip": rng.choice(pool),
+            "src_port": rng.randrange(1024, 65535),
+            "dest_ip": "10.20.20.10",
+            "dest_port": rng.choice((445, 1433, 3306, 21, 80)),
+            "protocol": "smbd",
+            "connection": {},
+            "raw": {},
+        }))
+    rng.shuffle(events)
+    return events
+
+
+def run(engine, events, key_fields, max_events):
+    events = list(events)
+    gc.collect()
+    started = time.perf_counter()
+    sessions = sessionize_dionaea(events, engine, key_fields)
+    sessions = cap_sessions(sessions, max_events)
+    split_seconds = time.perf_counter() - started
+    digest = hashlib.sha256()
+    for sess in sessions:
+        digest.update(encode_session(wrap_session("dionaea", sess)))
+    total_seconds = time.perf_counter() - started
+    return len(sessions), digest.hexdigest(), split_seconds, total_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the sessionize engines.")
+    parser.add_argument("--events", type=int, default=500_000)
+    parser.add_argument("--bursts", type=int, default=40, help="Activity clusters over the day.")
+    parser.add_argument("--sources", type=int, default=5000, help="Distinct attacker IPs.")
+    parser.add_argument("--key", default="none", help="Comma-separated session key fields, or 'none'.")
+    parser.add_argument("--max-events", type=int, default=0, help="Session size cap (0 = none).")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    key_fields = [f for f in args.key.split(",") if f and f != "none"]
+
+    events = dionaea_day(args.events, args.bursts, args.seed, args.sources)
+
+    results = {}
+    print(f"{args.events} Dionaea events, {args.bursts} bursts, key {args.key}, max events {args.max_events}")
+    print(f"{'engine':<8} {'sessions':>9} {'split s':>9} {'end-to-end s':>13}")
+    for engine in ("python", "numpy"):
+        count, digest, split_seconds, total_seconds = run(engine, events, key_fields, args.max_events)
+        results[engine] = digest
+        print(f"{engine:<8} {count:>9} {split_seconds:>9.3f} {total_seconds:>13.3f}")
+
+    same = results["python"] == results["numpy"]
+    print("identical sessions:", same)
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
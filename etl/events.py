@@ -0,0 +1,139 @@
+"""
+Compact in-memory representation of normalized events.
+
+Normalized events travel between stages as JSON dicts with the same 15
+keys. A day of Cowrie traffic is millions of them, and most values
+(sensor, protocol, eventid, IPs, ports, session ids) repeat constantly.
+`Event` stores the fields in __slots__ and interns the repeating values
+so every event shares one copy. `ts_us` (epoch microseconds, emitted by
+normalize) is what sorting and gap checks use; it is parsed here only for
+events normalized before the field existed.
+
+It reads like a dict (event["src_ip"], event.get("session_id")), so the
+sessionizers work on either, and converts back with to_dict() wherever
+events are written out.
+"""
+
+import sys
+
+from normalize import EVENT_FIELDS, parse_epoch_us
+
+
+# Fields whose values repeat across events and are worth interning
+CATEGORICAL_FIELDS = (
+    "sensor",
+    "session_id",
+    "src_ip",
+    "src_port",
+    "dest_ip",
+    "dest_port",
+    "protocol",
+    "eventid",
+    "event_type",
+)
+
+_interned = {}
+
+
+def intern_value(value):
+    """One shared object per distinct str/int value (ports, ids, IPs...)."""
+    if type(value) is str:
+        return sys.intern(value)
+    if type(value) is int:
+        return _interned.setdefault(value, value)
+    return value
+
+
+class Event:
+    """One normalized event."""
+
+    __slots__ = tuple(EVENT_FIELDS) + ("raw_ref", "extra")
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, None)
+        for name, value in fields.items():
+            self[name] = value
+
+    @classmethod
+    def from_dict(cls, data):
+        event = cls.__new__(cls)
+        get = data.get
+        for name in EVENT_FIELDS:
+            setattr(event, name, get(name))
+        for name in CATEGORICAL_FIELDS:
+            setattr(event, name, intern_value(getattr(event, name)))
+        raw = event.raw
+        if type(raw) is dict:
+            # Same keys on every hit of a sensor: share them
+            event.raw = {sys.intern(k): v for k, v in raw.items()}
+        event.raw_ref = get("raw_ref")
+        if event.ts_us is None:
+            event.ts_us = parse_epoch_us(event.timestamp)
+
+        extra = None
+        for key in data:
+            if key not in _KNOWN_KEYS:
+                if extra is None:
+                    extra = {}
+                extra[key] = data[key]
+        event.extra = extra
+        return event
+
+    def to_dict(self):
+        """The normalized dict this event was built from, keys in output order."""
+        data = {name: getattr(self, name) for name in EVENT_FIELDS}
+        if self.raw_ref is not None:
+            data["raw_ref"] = self.raw_ref
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    # dict-style access, so code written against plain events keeps working
+
+    def __getitem__(self, key):
+        if key in _SLOT_KEYS:
+            return getattr(self, key)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in _SLOT_KEYS:
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__(self, key):
+        if key in _FIELD_KEYS:
+            return True
+        if key in _SLOT_KEYS:
+            return getattr(self, key) is not None
+        return bool(self.extra) and key in self.extra
+
+    def get(self, key, default=None):
+        # Normalized fields always exist (possibly None), like in the dicts;
+        # raw_ref only when set.
+        if key in _FIELD_KEYS:
+            return getattr(self, key)
+        if key in _SLOT_KEYS:
+            value = getattr(self, key)
+            return default if value is None else value
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        return default
+
+    def __repr__(self):
+        return f"Event({self.sensor} {self.timestamp} {self.src_ip} {self.eventid or ''})"
+
+
+_FIELD_KEYS = frozenset(EVENT_FIELDS)
+_SLOT_KEYS = _FIELD_KEYS | {"raw_ref"}
+_KNOWN_KEYS = _SLOT_KEYS
+
+
+def to_dict(event):
+    """Plain dict for an Event or an already-plain event."""
+    return event.to_dict() if isinstance(event, Event) else event
@@ -1,6 +1,11 @@
-import os, json, requests, urllib3
-from datetime import datetime
+import os, gzip, json, time, shutil, argparse, itertools, tempfile, threading, requests, urllib3
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from normalize import SOURCE_FIELDS
 
 load_dotenv()
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -10,15 +15,49 @@ TPOT_PASS = os.getenv("TPOT_PASS")
 TPOT_HOST = os.getenv("TPOT_HOST", "https://10.20.20.10:64297")
 TPOT_INDEX = os.getenv("TPOT_INDEX", "logstash-2025.11.11")
 TPOT_PROXY_PATH = os.getenv("TPOT_PROXY_PATH", "/kibana/api/console/proxy")
-RAW_DIR = "/data/tpot_sessions/raw"
-BASE_URL = f"{TPOT_HOST}{TPOT_PROXY_PATH}?path={TPOT_INDEX}/_search&method=POST"
-HEADERS = {"kbn-xsrf": "true", "Content-Type": "application/json"}
+TPOT_INDEX_PREFIX = os.getenv("TPOT_INDEX_PREFIX", "logstash-")
+RAW_DIR = os.getenv("TPOT_RAW_DIR", "/data/tpot_sessions/raw")
+PROXY_URL = f"{TPOT_HOST}{TPOT_PROXY_PATH}"
+HEADERS = {
+    "kbn-xsrf": "true",
+    "Content-Type": "application/json",
+    "Accept-Encoding": "gzip",
+}
+
+# Paged (point-in-time + search_after) fetching
+PAGE_SIZE = int(os.getenv("TPOT_PAGE_SIZE", "5000"))
+PIT_KEEP_ALIVE = os.getenv("TPOT_PIT_KEEP_ALIVE", "2m")
+
+# Parallel time-sliced fetching over one pooled keep-alive session
+FETCH_WORKERS = int(os.getenv("TPOT_FETCH_WORKERS", "8"))
+HOST_CONCURRENCY = int(os.getenv("TPOT_HOST_CONCURRENCY", "4"))
+FETCH_RETRIES = int(os.getenv("TPOT_FETCH_RETRIES", "5"))
+FETCH_BACKOFF = float(os.getenv("TPOT_FETCH_BACKOFF", "0.5"))
+SLICE_HOURS = int(os.getenv("TPOT_SLICE_HOURS", "1"))
+
+# Projection / storage of raw hits
+FULL_SOURCE = os.getenv("TPOT_FULL_SOURCE", "0") == "1"
+KEEP_FIELDS = os.getenv("TPOT_KEEP_FIELDS", "0") == "1"
+COMPRESS_RAW = os.getenv("TPOT_COMPRESS_RAW", "1") == "1"
+
+# Date-range backfill: how many days are fetched at the same time
+BACKFILL_DAYS = int(os.getenv("TPOT_BACKFILL_DAYS", "3"))
+
+# Incremental fetching: per index/sensor watermark of the last fetched hit
+CHECKPOINT_FILE = os.getenv(
+    "TPOT_FETCH_CHECKPOINTS", os.path.join(RAW_DIR, "fetch_checkpoints.json")
+)
+
+# Sensor types to fetch; any type registered in normalize.NORMALIZERS works
+HONEYPOT_SENSORS = [
+    s.strip() for s in os.getenv("TPOT_FETCH_SENSORS", "Cowrie,Dionaea,Wordpot").split(",") if s.strip()
+]
 
 
 os.makedirs(RAW_DIR, exist_ok=True)
 
 
-def run_query(sensor_list):
+def run_query(sensor_list, index=TPOT_INDEX):
     query = {
         "query": {"terms": {"type.keyword": sensor_list}},
         "sort": [{"@timestamp": "desc"}],
@@ -26,7 +65,7 @@ def run_query(sensor_list):
     }
 
     response = requests.post(
-        BASE_URL,
+        f"{TPOT_HOST}{TPOT_PROXY_PATH}?path={index}/_search&method=POST",
         auth=(TPOT_USER, TPOT_PASS),
         json=query,
         headers=HEADERS,
@@ -52,14 +91,673 @@ def save_results(label, hits):
     print(f"[{label}] Saved {len(hits)} records → {out_path}")
 
 
-def fetch(label, type_list):
+def fetch(label, type_list, index=TPOT_INDEX):
     print(f"[INFO] Fetching {label}...")
-    hits = run_query(type_list)
+    hits = run_query(type_list, index)
     save_results(label, hits)
 
 
+# -----------------------------
+# Paged fetch (PIT + search_after)
+# -----------------------------
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Shared keep-alive session for every proxy request.
+
+    The connection pool is capped at HOST_CONCURRENCY connections per host
+    and blocks when exhausted, which is what bounds how hard the parallel
+    fetch hits the T-Pot. Transient errors (429/5xx, resets) are retried
+    with exponential backoff by urllib3.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=FETCH_RETRIES,
+                backoff_factor=FETCH_BACKOFF,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset({"POST"}),
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(
+                pool_maxsize=HOST_CONCURRENCY,
+                pool_block=True,
+                max_retries=retry,
+            )
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.auth = (TPOT_USER, TPOT_PASS)
+            session.headers.update(HEADERS)
+            session.verify = False
+            _session = session
+    return _session
+
+
+def proxy_request(path, body=None, method="POST"):
+    """
+    Send one Elasticsearch request through the Kibana console proxy.
+    `path` and `method` are the Elasticsearch ones; the proxy itself is
+    always called with POST.
+    """
+    response = get_session().post(
+        PROXY_URL,
+        params={"path": path, "method": method},
+        json=body,
+        timeout=60,
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def open_pit(index):
+    reply = proxy_request(f"{index}/_pit?keep_alive={PIT_KEEP_ALIVE}")
+    return reply["id"]
+
+
+def close_pit(pit_id):
+    try:
+        proxy_request("_pit", {"id": pit_id}, method="DELETE")
+    except requests.RequestException as e:
+        # The PIT expires on its own after keep_alive, so this is not fatal
+        print(f"[WARN] Could not close point-in-time: {e}")
+
+
+def build_query(sensor_list, start=None, end=None, after=None):
+    """
+    `start`/`end` bound the @timestamp range; `after` is a checkpoint (see
+    update_watermark) and excludes everything up to and including it.
+    """
+    filters = [{"terms": {"type.keyword": sensor_list}}]
+
+    time_range = {}
+    if start:
+        time_range["gte"] = start
+    if end:
+        time_range["lt"] = end
+    if time_range:
+        filters.append({"range": {"@timestamp": time_range}})
+
+    query = {"bool": {"filter": filters}}
+
+    if after:
+        filters.append({
+            "range": {"@timestamp": {"gte": after["sort"], "format": "epoch_millis"}}
+        })
+        # Hits sharing the checkpoint millisecond that were already fetched
+        query["bool"]["must_not"] = [{"ids": {"values": after["ids"]}}]
+
+    return query
+
+
+def search_path(keep_fields=KEEP_FIELDS):
+    """
+    _search path with a filter_path, so Elasticsearch only serialises the
+    parts of each hit we store (no _score/_version, and no `fields` block
+    unless asked for).
+    """
+    keep = ["pit_id", "hits.hits._index", "hits.hits._id",
+            "hits.hits._source", "hits.hits.sort"]
+    if keep_fields:
+        keep.append("hits.hits.fields")
+    return "_search?filter_path=" + ",".join(keep)
+
+
+def iter_pages(sensor_list, index=TPOT_INDEX, page_size=PAGE_SIZE,
+               start=None, end=None, pit_id=None, after=None,
+               full_source=FULL_SOURCE, keep_fields=KEEP_FIELDS):
+    """
+    Yield every matching hit of `index`, one page (list of hits) at a time.
+
+    A point-in-time keeps the view of the index stable while paging, and
+    search_after on (@timestamp, _shard_doc) walks past the 10,000-hit
+    window without the cost of deep from/size paging.
+
+    `start`/`end` restrict the walk to one time slice and `after` to hits
+    newer than a checkpoint. When `pit_id` is given the caller owns (and
+    closes) the point-in-time.
+
+    Unless `full_source` is set, _source is projected down to the fields
+    the normalizers read (normalize.SOURCE_FIELDS). The Elasticsearch
+    `fields` section is dropped unless `keep_fields` is set.
+    """
+    own_pit = pit_id is None
+    if own_pit:
+        pit_id = open_pit(index)
+    search_after = None
+
+    try:
+        while True:
+            body = {
+                "query": build_query(sensor_list, start, end, after),
+                "sort": [{"@timestamp": "asc"}, {"_shard_doc": "asc"}],
+                "size": page_size,
+                "pit": {"id": pit_id, "keep_alive": PIT_KEEP_ALIVE},
+                "track_total_hits": False,
+            }
+            if not full_source:
+                body["_source"] = {"includes": SOURCE_FIELDS}
+            if keep_fields:
+                body["fields"] = ["*"]
+            if search_after is not None:
+                body["search_after"] = search_after
+
+            reply = proxy_request(search_path(keep_fields), body)
+            # Elasticsearch may hand back a new PIT id on every page
+            pit_id = reply.get("pit_id", pit_id)
+
+            hits = reply.get("hits", {}).get("hits", [])
+            if not hits:
+                break
+
+            if not keep_fields:
+                for hit in hits:
+                    hit.pop("fields", None)
+
+            yield hits
+
+            if len(hits) < page_size:
+                break
+            search_after = hits[-1]["sort"]
+    finally:
+        if own_pit:
+            close_pit(pit_id)
+
+
+def raw_output_path(label, compress=COMPRESS_RAW, tag=None):
+    """
+    tpot_raw_<label>_<tag>.ndjson[.gz]; the tag defaults to the UTC run
+    time, backfills use the day so a re-run replaces that day's file.
+    """
+    suffix = ".ndjson.gz" if compress else ".ndjson"
+    if tag is None:
+        tag = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(RAW_DIR, f"tpot_raw_{label}_{tag}{suffix}")
+
+
+def open_raw(path, mode):
+    """Open a raw NDJSON file, gzip-compressed when the final name ends in .gz."""
+    if path.endswith((".gz", ".gz.part")):
+        return gzip.open(path, mode + "t", compresslevel=6)
+    return open(path, mode)
+
+
+def write_pages(path, pages):
+    """Write pages of hits to `path` as NDJSON and return the hit count."""
+    count = 0
+    with open_raw(path, "w") as f:
+        for hits in pages:
+            for hit in hits:
+                f.write(json.dumps(hit))
+                f.write("\n")
+            count += len(hits)
+    return count
+
+
+def save_pages(label, pages, compress=COMPRESS_RAW, tag=None):
+    """
+    Stream pages of hits to an NDJSON file (one hit per line) as they
+    arrive, so memory stays at one page no matter how large the day is.
+    The file only gets its final name once every page was written.
+    """
+    out_path = raw_output_path(label, compress, tag)
+    tmp_path = out_path + ".part"
+
+    try:
+        count = write_pages(tmp_path, pages)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    if not count:
+        os.remove(tmp_path)
+        return 0
+
+    os.replace(tmp_path, out_path)
+    print(f"[{label}] Saved {count} records → {out_path}")
+    return count
+
+
+def fetch_paged(label, type_list, index=TPOT_INDEX, incremental=False,
+                full_source=FULL_SOURCE, keep_fields=KEEP_FIELDS,
+                compress=COMPRESS_RAW, tag=None):
+    print(f"[INFO] Fetching {label} from {index} (paged)...")
+
+    checkpoints = load_checkpoints() if incremental else {}
+    marks = {}
+    pages = itertools.chain.from_iterable(
+        iter_pages(
+            [sensor],
+            index=index,
+            after=checkpoints.get(checkpoint_key(index, sensor)),
+            full_source=full_source,
+            keep_fields=keep_fields,
+        )
+        for sensor in type_list
+    )
+
+    count = save_pages(label, track_watermarks(pages, marks), compress, tag)
+    if incremental and count:
+        advance_checkpoints(index, marks)
+    return count
+
+
+# -----------------------------
+# Incremental checkpoints
+# -----------------------------
+
+_checkpoint_lock = threading.Lock()
+
+
+def checkpoint_key(index, sensor):
+    return f"{index}/{sensor}"
+
+
+def load_checkpoints():
+    if not os.path.isfile(CHECKPOINT_FILE):
+        return {}
+    with open(CHECKPOINT_FILE, "r") as f:
+        return json.load(f)
+
+
+def save_checkpoints(checkpoints):
+    """Write the checkpoint file atomically (temp file + rename)."""
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(CHECKPOINT_FILE) or ".", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(checkpoints, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, CHECKPOINT_FILE)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def update_watermark(mark, hit):
+    """
+    Fold one hit into a watermark: the highest @timestamp seen (as the
+    epoch-millis sort value) plus the _ids of every hit at exactly that
+    millisecond, which break ties on the next run.
+    """
+    ts = hit.get("sort", [None])[0]
+    if ts is None:
+        return mark
+
+    if mark is None or ts > mark["sort"]:
+        return {
+            "sort": ts,
+            "timestamp": hit.get("_source", {}).get("@timestamp"),
+            "ids": [hit["_id"]],
+        }
+    if ts == mark["sort"] and hit["_id"] not in mark["ids"]:
+        mark["ids"].append(hit["_id"])
+    return mark
+
+
+def merge_watermark(mark, other):
+    if other is None:
+        return mark
+    if mark is None or other["sort"] > mark["sort"]:
+        return {**other, "ids": list(other["ids"])}
+    if other["sort"] == mark["sort"]:
+        mark["ids"].extend(i for i in other["ids"] if i not in mark["ids"])
+    return mark
+
+
+def track_watermarks(pages, marks):
+    """Pass pages through unchanged while folding every hit into `marks` per sensor."""
+    for hits in pages:
+        for hit in hits:
+            sensor = hit.get("_source", {}).get("type")
+            marks[sensor] = update_watermark(marks.get(sensor), hit)
+        yield hits
+
+
+def advance_checkpoints(index, marks):
+    """Move the stored checkpoints of `index` forward to `marks`. Never moves one back."""
+    with _checkpoint_lock:
+        checkpoints = load_checkpoints()
+        for sensor, mark in marks.items():
+            key = checkpoint_key(index, sensor)
+            checkpoints[key] = merge_watermark(checkpoints.get(key), mark)
+        save_checkpoints(checkpoints)
+
+
+# -----------------------------
+# Parallel time-sliced fetch
+# -----------------------------
+
+def index_day(index):
+    """Return the date of a daily `logstash-YYYY.MM.DD` index, else None."""
+    try:
+        return datetime.strptime(index.rsplit("-", 1)[-1], "%Y.%m.%d")
+    except ValueError:
+        return None
+
+
+def day_slices(day, slice_hours=SLICE_HOURS):
+    """
+    Split one day into [start, end) time slices. The first and last slice
+    are left open-ended so documents stamped just outside the index's
+    nominal day are still fetched.
+    """
+    if day is None:
+        return [(None, None)]
+
+    slices = []
+    step = timedelta(hours=max(1, slice_hours))
+    cursor = day
+    day_end = day + timedelta(days=1)
+    while cursor < day_end:
+        slice_end = min(cursor + step, day_end)
+        slices.append((
+            cursor.strftime("%Y-%m-%dT%H:%M:%SZ") if cursor > day else None,
+            slice_end.strftime("%Y-%m-%dT%H:%M:%SZ") if slice_end < day_end else None,
+        ))
+        cursor = slice_end
+    return slices
+
+
+def iso_to_millis(ts):
+    parsed = datetime.strptime(ts, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+def fetch_slice(part_path, sensor, start, end, index, pit_id, after=None,
+                full_source=FULL_SOURCE, keep_fields=KEEP_FIELDS):
+    marks = {}
+    pages = iter_pages(
+        [sensor], index=index, start=start, end=end, pit_id=pit_id, after=after,
+        full_source=full_source, keep_fields=keep_fields,
+    )
+    count = write_pages(part_path, track_watermarks(pages, marks))
+    return count, marks
+
+
+def merge_parts(part_paths, out_path):
+    """
+    Concatenate NDJSON part files (in order) into `out_path`. Gzip parts
+    are concatenated as-is: a multi-member gzip file reads back as one
+    stream, so nothing is recompressed.
+    """
+    tmp_path = out_path + ".part"
+    with open(tmp_path, "wb") as out:
+        for part in part_paths:
+            with open(part, "rb") as f:
+                shutil.copyfileobj(f, out)
+    os.replace(tmp_path, out_path)
+
+
+def fetch_parallel(label, type_list, index=TPOT_INDEX,
+                   slice_hours=SLICE_HOURS, workers=FETCH_WORKERS,
+                   incremental=False, full_source=FULL_SOURCE,
+                   keep_fields=KEEP_FIELDS, compress=COMPRESS_RAW, tag=None):
+    """
+    Fetch one index as (time slice × sensor) units on a bounded thread pool.
+
+    All units share one point-in-time and the pooled session from
+    get_session(). Each unit streams into its own part file; once every
+    unit succeeded the parts are merged, in time order, into one raw file.
+
+    With `incremental`, each sensor only asks for hits past its checkpoint
+    (slices that end before it are skipped), and the checkpoints advance
+    only after the merged file is in place.
+    """
+    checkpoints = load_checkpoints() if incremental else {}
+
+    units = []
+    for start, end in day_slices(index_day(index), slice_hours):
+        for sensor in type_list:
+            after = checkpoints.get(checkpoint_key(index, sensor))
+            if after and end and iso_to_millis(end) <= after["sort"]:
+                continue
+            units.append((sensor, start, end, after))
+
+    out_path = raw_output_path(label, compress, tag)
+    parts_dir = out_path + ".parts"
+    part_suffix = ".ndjson.gz" if compress else ".ndjson"
+    os.makedirs(parts_dir, exist_ok=True)
+
+    print(f"[INFO] Fetching {label} from {index}: {len(units)} units on {workers} workers...")
+    started = time.monotonic()
+
+    marks = {}
+    count = 0
+    try:
+        pit_id = open_pit(index)
+        try:
+            part_paths = []
+            futures = []
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for n, (sensor, start, end, after) in enumerate(units):
+                    part_path = os.path.join(parts_dir, f"{n:05d}_{sensor}{part_suffix}")
+                    part_paths.append(part_path)
+                    futures.append(pool.submit(
+                        fetch_slice, part_path, sensor, start, end, index, pit_id,
+                        after, full_source, keep_fields,
+                    ))
+                for future in futures:
+                    unit_count, unit_marks = future.result()
+                    count += unit_count
+                    for sensor, mark in unit_marks.items():
+                        marks[sensor] = merge_watermark(marks.get(sensor), mark)
+        finally:
+            close_pit(pit_id)
+
+        if count:
+            merge_parts(part_paths, out_path)
+            if incremental:
+                advance_checkpoints(index, marks)
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+    elapsed = time.monotonic() - started
+    if count:
+        print(f"[{label}] Saved {count} records → {out_path} "
+              f"({elapsed:.1f}s, {count / max(elapsed, 1e-9):.0f} docs/s)")
+    return count
+
+
+# -----------------------------
+# Date-range backfill
+# -----------------------------
+
+def parse_day(value):
+    return datetime.strptime(value, "%Y-%m-%d")
+
+
+def index_for_day(day):
+    return f"{TPOT_INDEX_PREFIX}{day.strftime('%Y.%m.%d')}"
+
+
+def list_indices(pattern):
+    """Names of the indices matching `pattern`, or None if they cannot be listed."""
+    try:
+        rows = proxy_request(f"_cat/indices/{pattern}?format=json&h=index", method="GET")
+    except requests.RequestException as e:
+        print(f"[WARN] Could not list indices ({e}); trying every day in range")
+        return None
+    return {row["index"] for row in rows}
+
+
+def resolve_indices(start, end):
+    """Map each day of [start, end] to its daily index, skipping missing ones."""
+    existing = list_indices(f"{TPOT_INDEX_PREFIX}*")
+
+    resolved = []
+    day = start
+    while day <= end:
+        index = index_for_day(day)
+        if existing is None or index in existing:
+            resolved.append((day, index))
+        else:
+            print(f"[WARN] No index {index}, skipping {day.strftime('%Y-%m-%d')}")
+        day += timedelta(days=1)
+    return resolved
+
+
+def backfill(label, type_list, start, end, days=BACKFILL_DAYS,
+             sequential=False, incremental=False, **options):
+    """
+    Fetch every daily index between `start` and `end` (inclusive), up to
+    `days` of them at the same time, into one raw file per day:
+        tpot_raw_<label>_<YYYY-MM-DD>.ndjson.gz
+    Incremental runs keep the run timestamp in the name as well, so they
+    never replace an earlier file for the same day.
+
+    Returns the days that failed.
+    """
+    units = resolve_indices(start, end)
+    if not units:
+        print("[INFO] Nothing to backfill.")
+        return []
+
+    def fetch_day(day, index):
+        tag = day.strftime("%Y-%m-%d")
+        if incremental:
+            tag += "_" + datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        if sequential:
+            return fetch_paged(label, type_list, index=index,
+                               incremental=incremental, tag=tag, **options)
+        return fetch_parallel(label, type_list, index=index,
+                              incremental=incremental, tag=tag, **options)
+
+    print(f"[INFO] Backfilling {len(units)} days, {days} at a time...")
+    started = time.monotonic()
+    total = 0
+    failed = []
+
+    with ThreadPoolExecutor(max_workers=max(1, days)) as pool:
+        futures = {pool.submit(fetch_day, day, index): day for day, index in units}
+        for future in as_completed(futures):
+            day = futures[future].strftime("%Y-%m-%d")
+            try:
+                total += future.result()
+            except Exception as e:
+                print(f"[WARN] Backfill of {day} failed: {e}")
+                failed.append(day)
+
+    print(f"[INFO] Backfill done: {total} records in {time.monotonic() - started:.1f}s, "
+          f"{len(units) - len(failed)}/{len(units)} days ok")
+    return sorted(failed)
+
+
 def main():
-    fetch("honeypots", ["Cowrie", "Dionaea", "Wordpot"])
+    parser = argparse.ArgumentParser(description="Fetch raw honeypot hits from T-Pot.")
+    parser.add_argument(
+        "date",
+        nargs="?",
+        help="Day to fetch (YYYY-MM-DD); its logstash-YYYY.MM.DD index is used. "
+             "Without it TPOT_INDEX is fetched.",
+    )
+    parser.add_argument(
+        "--to",
+        dest="end_date",
+        help="Last day (inclusive) of a backfill starting at DATE.",
+    )
+    parser.add_argument(
+        "--days",
+        type=int,
+        default=BACKFILL_DAYS,
+        help="How many days a backfill fetches at the same time.",
+    )
+    parser.add_argument(
+        "--single-query",
+        action="store_true",
+        help="Legacy mode: one _search capped at the newest 10,000 hits.",
+    )
+    parser.add_argument(
+        "--sequential",
+        action="store_true",
+        help="Page through the whole index on one connection instead of in parallel slices.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=FETCH_WORKERS,
+        help="Fetch threads per day (connections stay capped by TPOT_HOST_CONCURRENCY).",
+    )
+    parser.add_argument("--slice-hours", type=int, default=SLICE_HOURS)
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only fetch hits newer than the stored per-index/per-sensor checkpoint.",
+    )
+    parser.add_argument(
+        "--full-source",
+        action="store_true",
+        default=FULL_SOURCE,
+        help="Store the complete _source instead of only the fields normalize.py reads.",
+    )
+    parser.add_argument(
+        "--keep-fields",
+        action="store_true",
+        default=KEEP_FIELDS,
+        help="Also request and store the Elasticsearch `fields` section of each hit.",
+    )
+    parser.add_argument(
+        "--no-compress",
+        dest="compress",
+        action="store_false",
+        default=COMPRESS_RAW,
+        help="Write plain .ndjson raw files instead of .ndjson.gz.",
+    )
+    args = parser.parse_args()
+
+    if args.end_date and not args.date:
+        parser.error("--to needs a start DATE")
+    if args.single_query and args.end_date:
+        parser.error("--single-query fetches one index; it cannot be combined with --to")
+
+    options = {
+        "full_source": args.full_source,
+        "keep_fields": args.keep_fields,
+        "compress": args.compress,
+    }
+
+    if args.single_query:
+        index = index_for_day(parse_day(args.date)) if args.date else TPOT_INDEX
+        fetch("honeypots", HONEYPOT_SENSORS, index)
+    elif args.date:
+        start = parse_day(args.date)
+        end = parse_day(args.end_date) if args.end_date else start
+        if not args.sequential:
+            options["slice_hours"] = args.slice_hours
+            options["workers"] = args.workers
+        failed = backfill(
+            "honeypots",
+            HONEYPOT_SENSORS,
+            start,
+            end,
+            days=args.days,
+            sequential=args.sequential,
+            incremental=args.incremental,
+            **options,
+        )
+        if failed:
+            print(f"[WARN] Failed days: {', '.join(failed)}")
+            raise SystemExit(1)
+    elif args.sequential:
+        fetch_paged(
+            "honeypots", HONEYPOT_SENSORS, incremental=args.incremental, **options
+        )
+    else:
+        fetch_parallel(
+            "honeypots",
+            HONEYPOT_SENSORS,
+            slice_hours=args.slice_hours,
+            workers=args.workers,
+            incremental=args.incremental,
+            **options,
+        )
 
 
 if __name__ == "__main__":
@@ -1,11 +1,35 @@
 import os
+import gzip
 import json
+import time
+import zlib
+import heapq
+import shutil
+import sqlite3
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 
 load_dotenv()
 
 ETL_DATA_DIR = os.getenv("TPOT_RAW_DIR", "/data/tpot_sessions/raw")
 NORMALIZED_BASE = os.getenv("TPOT_NORMALIZED_DIR", "/data/tpot_sessions/normalized")
+LEDGER_PATH = os.getenv(
+    "TPOT_NORMALIZE_LEDGER", os.path.join(NORMALIZED_BASE, "normalize_ledger.sqlite")
+)
+NORMALIZE_WORKERS = int(os.getenv("TPOT_NORMALIZE_WORKERS", "1"))
+CHUNK_BYTES = int(os.getenv("TPOT_NORMALIZE_CHUNK_MB", "64")) * 1024 * 1024
+
+# "segments": <day>/<sensor>/seg-NNNNNN.ndjson + manifest.json, appended to
+# by every run. "json": one <day>/<sensor>.json array, rewritten on merge.
+NORMALIZED_LAYOUT = os.getenv("TPOT_NORMALIZED_LAYOUT", "segments")
+SEGMENT_MAX_EVENTS = int(os.getenv("TPOT_SEGMENT_MAX_EVENTS", "500000"))
+MANIFEST_NAME = "manifest.json"
+
+
+RAW_EXTENSIONS = (".json", ".ndjson", ".ndjson.gz")
 
 
 def load_json_file(path):
@@ -13,10 +37,221 @@ def load_json_file(path):
         return json.load(f)
 
 
+def load_ndjson_file(path):
+    hits = []
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt") as f:
+        for line in f:
+            if line.strip():
+                hits.append(json.loads(line))
+    return hits
+
+
+def load_hits_file(path):
+    """Load raw hits from either a JSON array dump or a paged NDJSON dump."""
+    if path.endswith((".ndjson", ".ndjson.gz")):
+        return load_ndjson_file(path)
+    return load_json_file(path)
+
+
+def iter_json_array(f, chunk_size=1 << 20):
+    """
+    Yield the objects of a top-level JSON array one at a time, reading
+    `f` in chunks, so an array dump is never loaded whole.
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    opened = False
+
+    while True:
+        # Skip whitespace, the opening bracket and separators
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,[":
+                if buf[pos] == "[":
+                    if opened:
+                        raise ValueError("nested arrays are not supported")
+                    opened = True
+                pos += 1
+            if pos < len(buf):
+                break
+            buf, pos = f.read(chunk_size), 0
+            if not buf:
+                return
+
+        if buf[pos] == "]":
+            return
+
+        while True:
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+                break
+            except json.JSONDecodeError:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    raise
+                buf, pos = buf[pos:] + chunk, 0
+
+        yield obj
+        pos = end
+
+
+def iter_hits(path, with_refs=False):
+    """
+    Stream raw hits from a JSON array, NDJSON or gzip NDJSON dump.
+
+    With `with_refs`, each NDJSON hit gets a `_raw_ref` entry pointing at
+    its line (raw file name, byte offset and length in the uncompressed
+    stream, and _id). JSON array dumps have no stable offsets and never
+    carry a ref.
+    """
+    if path.endswith((".ndjson", ".ndjson.gz")):
+        yield from iter_ndjson_range(path, with_refs=with_refs)
+    else:
+        with open(path, "r") as f:
+            yield from iter_json_array(f)
+
+
+def iter_ndjson_range(path, start=0, end=None, with_refs=False):
+    """
+    Yield the NDJSON hits whose line starts in [start, end) bytes of the
+    (uncompressed) stream. Adjacent ranges therefore split a file without
+    losing or repeating a line. Gzip files can only be read from 0 here;
+    see iter_gzip_members for splitting them.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+
+    with opener(path, "rb") as f:
+        offset = 0
+        if start:
+            # Skip the tail of the line that straddles `start`
+            f.seek(start - 1)
+            offset = start - 1 + len(f.readline())
+
+        yield from _iter_ndjson_lines(f, offset, end, os.path.basename(path), with_refs)
+
+
+def _iter_ndjson_lines(f, offset, end, name, with_refs):
+    while end is None or offset < end:
+        line = f.readline()
+        if not line:
+            break
+        length = len(line)
+        if line.strip():
+            hit = json.loads(line)
+            if with_refs:
+                hit["_raw_ref"] = {
+                    "file": name,
+                    "offset": offset,
+                    "length": length,
+                    "id": hit.get("_id"),
+                }
+            yield hit
+        offset += length
+
+
+class _ByteRange:
+    """Read-only view of `length` bytes of an open file from its current position."""
+
+    def __init__(self, f, length):
+        self.f = f
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.f.read(size)
+        self.remaining -= len(data)
+        return data
+
+
+def gzip_members(path):
+    """
+    [(start, end, uncompressed_offset)] of every gzip member in `path`:
+    its compressed byte range and where its data begins in the
+    decompressed stream. Costs one decompression pass, output discarded.
+    The fetcher's parallel runs concatenate one member per part file.
+    """
+    members = []
+    start = pos = uncompressed = member_start = 0
+    d = zlib.decompressobj(wbits=31)
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(1 << 20)
+            if not data:
+                break
+            while data:
+                uncompressed += len(d.decompress(data))
+                if not d.eof:
+                    pos += len(data)
+                    break
+                pos += len(data) - len(d.unused_data)
+                members.append((start, pos, member_start))
+                data = d.unused_data
+                d = zlib.decompressobj(wbits=31)
+                start, member_start = pos, uncompressed
+                if not data.strip(b"\0"):
+                    break  # trailing zero padding
+    return members
+
+
+def iter_gzip_members(path, start, end, uncompressed_offset=0, with_refs=False):
+    """
+    Yield the hits of the whole gzip members stored in compressed bytes
+    [start, end) of `path` (boundaries from gzip_members). raw_ref offsets
+    count from `uncompressed_offset`, so they match a read of the whole file.
+    """
+    with open(path, "rb") as raw:
+        raw.seek(start)
+        with gzip.GzipFile(fileobj=_ByteRange(raw, end - start), mode="rb") as f:
+            yield from _iter_ndjson_lines(f, uncompressed_offset, None, os.path.basename(path), with_refs)
+
+
+def open_raw_ref_file(name, raw_dir=ETL_DATA_DIR):
+    path = os.path.join(raw_dir, name)
+    opener = gzip.open if path.endswith(".gz") else open
+    return opener(path, "rb")
+
+
+def read_raw_ref(f, ref):
+    """Read the hit `ref` points at from an open raw file and return its _source."""
+    f.seek(ref["offset"])
+    hit = json.loads(f.read(ref["length"]))
+    if ref.get("id") is not None and hit.get("_id") != ref["id"]:
+        raise ValueError(f"Raw file {ref['file']} changed since it was normalized")
+    return hit.get("_source", {})
+
+
+def load_raw(ref, raw_dir=ETL_DATA_DIR):
+    """Lazily load the full raw _source behind an event's `raw_ref`."""
+    with open_raw_ref_file(ref["file"], raw_dir) as f:
+        return read_raw_ref(f, ref)
+
+
+def resolve_raw(events, raw_dir=ETL_DATA_DIR):
+    """
+    Replace the slim `raw` of every event carrying a `raw_ref` with the
+    full _source. Refs are read file by file in offset order, so each raw
+    file (gzip included) is decompressed at most once.
+    """
+    by_file = {}
+    for event in events:
+        ref = event.get("raw_ref")
+        if ref:
+            by_file.setdefault(ref["file"], []).append(event)
+
+    for name, file_events in by_file.items():
+        file_events.sort(key=lambda e: e["raw_ref"]["offset"])
+        with open_raw_ref_file(name, raw_dir) as f:
+            for event in file_events:
+                event["raw"] = read_raw_ref(f, event["raw_ref"])
+    return events
+
+
 def find_latest_file(prefix):
     files = []
     for name in os.listdir(ETL_DATA_DIR):
-        if name.startswith(prefix) and name.endswith(".json"):
+        if name.startswith(prefix) and name.endswith(RAW_EXTENSIONS):
             files.append(name)
     if not files:
         return None
@@ -24,115 +259,340 @@ def find_latest_file(prefix):
     return os.path.join(ETL_DATA_DIR, files[-1])
 
 
+def find_raw_files(prefix):
+    """All finished raw dumps starting with `prefix`, oldest name first."""
+    files = []
+    for name in os.listdir(ETL_DATA_DIR):
+        if name.startswith(prefix) and name.endswith(RAW_EXTENSIONS):
+            files.append(name)
+    files.sort()
+    return [os.path.join(ETL_DATA_DIR, name) for name in files]
+
+
+# -----------------------------
+# Timestamps
+# -----------------------------
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+US_PER_DAY = 86400 * 1_000_000
+
+_day_names = {}
+
+
+def parse_epoch_us(ts):
+    """
+    ISO8601 timestamp -> integer microseconds since the epoch, UTC.
+    Accepts the `Z` form of @timestamp, explicit offsets and naive
+    timestamps (taken as UTC). None for a missing or unparsable value.
+    """
+    if not ts:
+        return None
+    try:
+        dt = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+    except (TypeError, ValueError):
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    delta = dt - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def day_from_epoch_us(ts_us):
+    """UTC day (YYYY-MM-DD) of an epoch-microsecond timestamp."""
+    if ts_us is None:
+        return "unknown"
+    day = ts_us // US_PER_DAY
+    name = _day_names.get(day)
+    if name is None:
+        name = _day_names[day] = datetime.fromtimestamp(day * 86400, timezone.utc).strftime("%Y-%m-%d")
+    return name
+
+
 # -----------------------------
 # Normalizerss
 # -----------------------------
 
-def normalize_cowrie(src):
-    timestamp = src.get("@timestamp") or src.get("timestamp")
-    event = {
-        "timestamp": timestamp,
-        "sensor": "Cowrie",
-        "session_id": src.get("session"),
-        "src_ip": src.get("src_ip"),
-        "src_port": src.get("src_port"),
-        "dest_ip": src.get("dest_ip") or src.get("t-pot_ip_int") \
-         or src.get("t-pot_ip_ext"),
-        "dest_port": src.get("dest_port"),
-        "protocol": src.get("protocol"), 
-        "eventid": src.get("eventid"),
-        "message": src.get("message"),
-        "url": None,
-        "connection": None,
-        "event_type": None,
-        "raw": src,
-    }
-    return event
+# Normalized event layout, in output order. ts_us is `timestamp` parsed
+# once to epoch microseconds (UTC); later stages sort and compare on it.
+EVENT_FIELDS = [
+    "timestamp",
+    "ts_us",
+    "sensor",
+    "session_id",
+    "src_ip",
+    "src_port",
+    "dest_ip",
+    "dest_port",
+    "protocol",
+    "eventid",
+    "message",
+    "url",
+    "connection",
+    "event_type",
+    "raw",
+]
 
 
-def normalize_wordpot(src):
-    timestamp = src.get("@timestamp") or src.get("timestamp")
-    event = {
-        "timestamp": timestamp,
-        "sensor": "Wordpot",
-        "session_id": None,  # Wordpot has no session concept
-        "src_ip": src.get("src_ip"),
-        "src_port": src.get("src_port"),
+class Const:
+    """Field-map value: a literal instead of a _source lookup."""
+
+    def __init__(self, value):
+        self.value = value
+
+
+# Defaults shared by every sensor. A tuple lists _source keys tried in
+# order, first truthy value wins (`a or b or c`); dotted keys read nested
+# objects. Fields not mapped at all are None.
+COMMON_FIELD_MAP = {
+    "timestamp": ("@timestamp", "timestamp"),
+    "src_ip": ("src_ip",),
+    "src_port": ("src_port",),
+    "dest_ip": ("dest_ip",),
+    "dest_port": ("dest_port",),
+}
+
+# T-Pot `type` -> (output key, field map on top of COMMON_FIELD_MAP)
+SENSOR_FIELD_MAPS = {
+    "Cowrie": ("cowrie", {
+        "session_id": ("session",),
+        "dest_ip": ("dest_ip", "t-pot_ip_int", "t-pot_ip_ext"),
+        "protocol": ("protocol",),
+        "eventid": ("eventid",),
+        "message": ("message",),
+    }),
+    "Wordpot": ("wordpot", {
         # prefer T-Pot internal IP as dest
-        "dest_ip": src.get("t-pot_ip_int") or src.get("dest_ip"),
-        "dest_port": src.get("dest_port"),
-        "protocol": "http",  # Wordpot is HTTP/WordPress emu
-        "eventid": None,
-        "message": None,
-        "url": src.get("url"),
-        "connection": None,
-        "event_type": None,
-        "raw": src,
-    }
-    return event
-
-
-def normalize_dionaea(src):
-    timestamp = src.get("@timestamp") or src.get("timestamp")
-    conn = src.get("connection", {}) or {}
-    event = {
-        "timestamp": timestamp,
-        "sensor": "Dionaea",
-        "session_id": None,  # no sessions, grouped by time later
-        "src_ip": src.get("src_ip"),
-        "src_port": src.get("src_port"),
-        "dest_ip": src.get("dest_ip") or src.get("t-pot_ip_int"),
-        "dest_port": src.get("dest_port"),
-        "protocol": conn.get("protocol"),
-        "eventid": None,
-        "message": None,
-        "url": None,
-        "connection": conn,
-        "event_type": None,
-        "raw": src,
-    }
-    return event
+        "dest_ip": ("t-pot_ip_int", "dest_ip"),
+        "protocol": Const("http"),  # Wordpot is HTTP/WordPress emu
+        "url": ("url",),
+    }),
+    "Dionaea": ("dionaea", {
+        "dest_ip": ("dest_ip", "t-pot_ip_int"),
+        "protocol": ("connection.protocol",),
+        "connection": ("connection", Const({})),
+    }),
+    "Honeytrap": ("honeytrap", {
+        "dest_ip": ("dest_ip", "t-pot_ip_int"),
+        "protocol": ("attack_connection.protocol", "protocol"),
+    }),
+    "Suricata": ("suricata", {
+        "protocol": ("app_proto", "proto"),
+        "message": ("alert.signature",),
+        "url": ("http.url",),
+        "event_type": ("event_type",),
+    }),
+    "Heralding": ("heralding", {
+        "session_id": ("session_id",),
+        "dest_ip": ("dest_ip", "t-pot_ip_int"),
+        "protocol": ("protocol",),
+    }),
+    "Tanner": ("tanner", {
+        "session_id": ("uuid",),
+        "dest_ip": ("dest_ip", "t-pot_ip_int"),
+        "protocol": Const("http"),
+        "url": ("url",),
+        "event_type": ("method",),
+    }),
+    "Adbhoney": ("adbhoney", {
+        "session_id": ("session",),
+        "dest_ip": ("dest_ip", "t-pot_ip_int"),
+        "protocol": Const("adb"),
+        "eventid": ("eventid",),
+        "message": ("message",),
+    }),
+    "Mailoney": ("mailoney", {
+        "dest_ip": ("dest_ip", "t-pot_ip_int"),
+        "protocol": Const("smtp"),
+    }),
+    "ConPot": ("conpot", {
+        "session_id": ("id",),
+        "dest_ip": ("dest_ip", "t-pot_ip_int"),
+        "protocol": ("data_type",),
+        "event_type": ("event_type",),
+    }),
+    "ElasticPot": ("elasticpot", {
+        "dest_ip": ("dest_ip", "t-pot_ip_int"),
+        "protocol": Const("http"),
+        "url": ("url",),
+    }),
+    "Redishoneypot": ("redishoneypot", {
+        "dest_ip": ("dest_ip", "t-pot_ip_int"),
+        "protocol": Const("redis"),
+    }),
+    "Sentrypeer": ("sentrypeer", {
+        "dest_ip": ("dest_ip", "t-pot_ip_int"),
+        "protocol": Const("sip"),
+    }),
+    "Endlessh": ("endlessh", {
+        "dest_ip": ("dest_ip", "t-pot_ip_int"),
+        "protocol": Const("ssh"),
+    }),
+    "Ciscoasa": ("ciscoasa", {
+        "dest_ip": ("dest_ip", "t-pot_ip_int"),
+        "protocol": Const("https"),
+    }),
+    "CitrixHoneypot": ("citrixhoneypot", {
+        "dest_ip": ("dest_ip", "t-pot_ip_int"),
+        "protocol": Const("https"),
+    }),
+    "Ddospot": ("ddospot", {
+        "dest_ip": ("dest_ip", "t-pot_ip_int"),
+        "protocol": ("protocol",),
+    }),
+    "Dicompot": ("dicompot", {
+        "dest_ip": ("dest_ip", "t-pot_ip_int"),
+        "protocol": Const("dicom"),
+    }),
+    "Ipphoney": ("ipphoney", {
+        "dest_ip": ("dest_ip", "t-pot_ip_int"),
+        "protocol": Const("ipp"),
+    }),
+    "Medpot": ("medpot", {
+        "dest_ip": ("dest_ip", "t-pot_ip_int"),
+        "protocol": Const("hl7"),
+    }),
+}
+
+# The only raw fields read downstream (Cowrie commands, and credentials
+# for ai/layer1/fingerprint.py); in raw-ref mode events keep just these
+# inline and point at the rest (see iter_hits / load_raw).
+RAW_REF_FIELDS = ["input", "username", "password"]
+
+
+def _source_keys(spec):
+    if spec is None or isinstance(spec, Const):
+        return []
+    return [item for item in spec if not isinstance(item, Const)]
+
+
+def _source_expr(key, local_names):
+    """Python expression reading `key` (possibly dotted) from `src`."""
+    parts = key.split(".")
+    expr = local_names.get(parts[0]) or f"src.get({parts[0]!r})"
+    for part in parts[1:]:
+        expr = f"({expr} or {{}}).get({part!r})"
+    return expr
+
+
+def _field_expr(spec, local_names):
+    if spec is None:
+        return "None"
+    if isinstance(spec, Const):
+        # repr() of a literal builds a fresh object on every call
+        return repr(spec.value)
+    terms = []
+    for item in spec:
+        terms.append(repr(item.value) if isinstance(item, Const) else _source_expr(item, local_names))
+    return " or ".join(terms)
+
+
+def compile_normalizer(sensor, field_map):
+    """
+    Compile a field map into one plain function building the event dict,
+    so the per-hit cost matches a hand-written normalizer: one dict
+    literal, no per-field function calls or loops. Top-level keys read by
+    more than one field are looked up once into a local.
+    """
+    fields = dict(COMMON_FIELD_MAP)
+    fields.update(field_map)
+    fields["sensor"] = Const(sensor)
+
+    reads = {}
+    for name in EVENT_FIELDS:
+        for key in _source_keys(fields.get(name)):
+            top = key.split(".")[0]
+            reads[top] = reads.get(top, 0) + 1
+
+    lines = [f"def normalize_{sensor.lower()}(src):"]
+    local_names = {}
+    for top, count in reads.items():
+        if count > 1:
+            local_names[top] = f"_v{len(local_names)}"
+            lines.append(f"    {local_names[top]} = src.get({top!r})")
+
+    lines.append(f"    ts = {_field_expr(fields['timestamp'], local_names)}")
+    lines.append("    return {")
+    for name in EVENT_FIELDS:
+        if name == "raw":
+            expr = "src"
+        elif name == "timestamp":
+            expr = "ts"
+        elif name == "ts_us":
+            expr = "parse_epoch_us(ts)"
+        else:
+            expr = _field_expr(fields.get(name), local_names)
+        lines.append(f"        {name!r}: {expr},")
+    lines.append("    }")
+    source = "\n".join(lines)
+
+    namespace = {"parse_epoch_us": parse_epoch_us}
+    exec(compile(source, f"<normalizer {sensor}>", "exec"), namespace)
+    func = namespace[f"normalize_{sensor.lower()}"]
+    func.source = source
+    return func
 
 
+# T-Pot `type` -> (output key, compiled normalizer); process_hits dispatches
+# through this dict.
+NORMALIZERS = {
+    sensor: (key, compile_normalizer(sensor, field_map))
+    for sensor, (key, field_map) in SENSOR_FIELD_MAPS.items()
+}
 
+normalize_cowrie = NORMALIZERS["Cowrie"][1]
+normalize_wordpot = NORMALIZERS["Wordpot"][1]
+normalize_dionaea = NORMALIZERS["Dionaea"][1]
+
+
+def source_fields():
+    """
+    Every _source key any registered normalizer reads, plus type and
+    RAW_REF_FIELDS. The fetcher requests only these.
+    """
+    keys = {"type"}
+    keys.update(RAW_REF_FIELDS)
+    for _, field_map in SENSOR_FIELD_MAPS.values():
+        for spec in list(COMMON_FIELD_MAP.values()) + list(field_map.values()):
+            keys.update(_source_keys(spec))
+    return sorted(keys)
+
+
+SOURCE_FIELDS = source_fields()
 
 
 # -----------------------------
 # Helpers
 # -----------------------------
 
-def get_date_from_timestamp(ts):
-    # ts example: "2025-11-11T13:36:46.602Z"
-    if not ts:
-        return "unknown"
-    if "T" in ts:
-        return ts.split("T")[0]
-    return ts[:10]
-
+def process_hits(hits, out_dict, writer=None):
+    """
+    Normalize `hits` into out_dict[date][sensor], or straight into
+    `writer` (a NormalizedWriter) when one is given.
 
-def process_hits(hits, out_dict):
+    Hits carrying a `_raw_ref` (see iter_hits) keep only RAW_REF_FIELDS
+    in `raw` plus the `raw_ref` pointer instead of the full _source.
+    """
+    normalizers = NORMALIZERS
     for hit in hits:
         src = hit.get("_source", {})
-        sensor_type = src.get("type")
+        entry = normalizers.get(src.get("type"))
 
-        if not sensor_type:
-            continue
-
-        if sensor_type == "Cowrie":
-            norm = normalize_cowrie(src)
-            key = "cowrie"
-        elif sensor_type == "Wordpot":
-            norm = normalize_wordpot(src)
-            key = "wordpot"
-        elif sensor_type == "Dionaea":
-            norm = normalize_dionaea(src)
-            key = "dionaea"
-        
-        else:
+        if entry is None:
             # Unknown / unhandled type, skip for now
             continue
 
-        date_str = get_date_from_timestamp(norm["timestamp"])
+        key, normalize = entry
+        norm = normalize(src)
+
+        ref = hit.get("_raw_ref")
+        if ref is not None:
+            norm["raw"] = {k: src[k] for k in RAW_REF_FIELDS if k in src}
+            norm["raw_ref"] = ref
+
+        date_str = day_from_epoch_us(norm["ts_us"])
+        if writer is not None:
+            writer.write(date_str, key, norm, hit.get("_id"))
+            continue
         if date_str not in out_dict:
             out_dict[date_str] = {}
         if key not in out_dict[date_str]:
@@ -140,7 +600,11 @@ def process_hits(hits, out_dict):
         out_dict[date_str][key].append(norm)
 
 
-def save_normalized(out_dict):
+def save_normalized(out_dict, merge=False):
+    """
+    Write out_dict[date][sensor] to <day>/<sensor>.json. With `merge`,
+    events already in an existing file are kept and the new ones appended.
+    """
     for date_str in out_dict:
         day_dir = os.path.join(NORMALIZED_BASE, date_str)
         if not os.path.isdir(day_dir):
@@ -148,38 +612,773 @@ def save_normalized(out_dict):
 
         for sensor_key in out_dict[date_str]:
             out_path = os.path.join(day_dir, sensor_key + ".json")
+            events = out_dict[date_str][sensor_key]
+            if merge and os.path.isfile(out_path):
+                events = load_json_file(out_path) + events
             with open(out_path, "w") as f:
-                json.dump(out_dict[date_str][sensor_key], f, indent=2)
-            print("Saved", len(out_dict[date_str][sensor_key]), "events to", out_path)
+                json.dump(events, f, indent=2)
+            print("Saved", len(events), "events to", out_path)
+
+
+class NormalizedWriter:
+    """
+    Streams normalized events into <day>/<sensor>.json as they are
+    produced. Each file is written as a JSON array, one event per line,
+    under a temporary name and renamed into place on close(), so readers
+    never see a half-written day.
+
+    With `merge`, the events of an existing day file are copied over
+    (streamed, not loaded) before the new ones.
+    """
+
+    def __init__(self, base_dir=NORMALIZED_BASE, merge=False):
+        self.base_dir = base_dir
+        self.merge = merge
+        self.files = {}
+        self.counts = {}
+
+    def write(self, date_str, sensor_key, event, doc_id=None):
+        self.write_line(date_str, sensor_key, json.dumps(event))
+
+    def write_line(self, date_str, sensor_key, line, ts=None):
+        """Append one already-serialized event."""
+        key = (date_str, sensor_key)
+        f = self.files.get(key)
+        if f is None:
+            day_dir = os.path.join(self.base_dir, date_str)
+            os.makedirs(day_dir, exist_ok=True)
+            out_path = os.path.join(day_dir, sensor_key + ".json")
+            f = open(out_path + ".part", "w")
+            f.write("[\n")
+            self.files[key] = f
+            self.counts[key] = 0
+            if self.merge and os.path.isfile(out_path):
+                with open(out_path, "r") as existing:
+                    for old_event in iter_json_array(existing):
+                        if self.counts[key]:
+                            f.write(",\n")
+                        f.write(json.dumps(old_event))
+                        self.counts[key] += 1
+        if self.counts[key]:
+            f.write(",\n")
+        f.write(line)
+        self.counts[key] += 1
+
+    def close(self):
+        for (date_str, sensor_key), f in self.files.items():
+            f.write("\n]\n")
+            f.close()
+            out_path = os.path.join(self.base_dir, date_str, sensor_key + ".json")
+            os.replace(out_path + ".part", out_path)
+            print("Saved", self.counts[(date_str, sensor_key)], "events to", out_path)
+        self.files = {}
+
+    def abort(self):
+        for (date_str, sensor_key), f in self.files.items():
+            f.close()
+            os.remove(os.path.join(self.base_dir, date_str, sensor_key + ".json.part"))
+        self.files = {}
+
+
+class ShardWriter:
+    """
+    Worker-side writer for parallel normalize: NDJSON shard files per
+    (day, sensor) under `shard_dir`, each with a sidecar (shard path +
+    ".ids") holding `[_id, ts_us]` per line, so the merge step can
+    deduplicate without parsing the events again. Neither the worker nor
+    the parent holds the ids in memory.
+    """
+
+    def __init__(self, shard_dir):
+        self.shard_dir = shard_dir
+        self.files = {}
+
+    def write(self, date_str, sensor_key, event, doc_id=None):
+        key = (date_str, sensor_key)
+        files = self.files.get(key)
+        if files is None:
+            path = os.path.join(self.shard_dir, f"{date_str}__{sensor_key}.ndjson")
+            files = self.files[key] = (open(path, "w"), open(path + ".ids", "w"))
+        out, ids = files
+        out.write(json.dumps(event))
+        out.write("\n")
+        ids.write(json.dumps([doc_id, event.get("ts_us")]))
+        ids.write("\n")
+
+    def close(self):
+        shards = []
+        for (date_str, sensor_key), (out, ids) in self.files.items():
+            out.close()
+            ids.close()
+            shards.append({"day": date_str, "sensor": sensor_key, "path": out.name})
+        self.files = {}
+        return shards
+
+
+# -----------------------------
+# Segmented day files
+# -----------------------------
+
+def sensor_dir(date_str, sensor_key, base_dir=NORMALIZED_BASE):
+    return os.path.join(base_dir, date_str, sensor_key)
+
+
+def load_manifest(path):
+    """Segments of one day/sensor; a missing manifest means none yet."""
+    if not os.path.isfile(path):
+        return {"segments": []}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_manifest(path, manifest):
+    """Replace the manifest atomically; it is the commit point for segments."""
+    manifest["events"] = sum(seg["events"] for seg in manifest["segments"])
+    fd, tmp = tempfile.mkstemp(prefix=".manifest-", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def next_segment_number(manifest, directory):
+    numbers = [int(seg["file"][4:10]) for seg in manifest["segments"]]
+    numbers += [
+        int(name[4:10]) for name in os.listdir(directory)
+        if name.startswith("seg-") and name[4:10].isdigit()
+    ]
+    return max(numbers, default=0) + 1
+
+
+class SegmentWriter:
+    """
+    Appends normalized events as new NDJSON segments under
+    <day>/<sensor>/, so existing data is never rewritten. Segments are
+    written under a temporary name and only become visible once close()
+    has renamed them and listed them in the manifest; a crashed run leaves
+    nothing a reader would pick up.
+
+    Each segment records its event count, min/max timestamp and whether
+    its events arrived in timestamp order, which lets readers merge sorted
+    segments without loading them. Without `merge`, the listed segments
+    (and a legacy <sensor>.json) are replaced by this run's instead.
+    """
+
+    def __init__(self, base_dir=NORMALIZED_BASE, merge=True, max_events=SEGMENT_MAX_EVENTS,
+                 compacted_from=None):
+        self.base_dir = base_dir
+        self.merge = merge
+        self.max_events = max_events
+        self.compacted_from = compacted_from
+        self.open_segments = {}
+        self.done = {}
+        self.next_number = {}
+
+    def write(self, date_str, sensor_key, event, doc_id=None):
+        self.write_line(date_str, sensor_key, json.dumps(event), event.get("ts_us"))
+
+    def write_line(self, date_str, sensor_key, line, ts=None):
+        """Append one already-serialized event."""
+        key = (date_str, sensor_key)
+        seg = self.open_segments.get(key)
+        if seg is None or seg["events"] >= self.max_events:
+            if seg is not None:
+                self._finish(key, seg)
+            seg = self.open_segments[key] = self._start(key)
+
+        f = seg["fh"]
+        f.write(line)
+        f.write("\n")
+        seg["events"] += 1
+        if ts is not None:
+            if seg["max_ts_us"] is not None and ts < seg["max_ts_us"]:
+                seg["sorted"] = False
+            if seg["min_ts_us"] is None or ts < seg["min_ts_us"]:
+                seg["min_ts_us"] = ts
+            if seg["max_ts_us"] is None or ts > seg["max_ts_us"]:
+                seg["max_ts_us"] = ts
+
+    def _start(self, key):
+        directory = sensor_dir(*key, base_dir=self.base_dir)
+        os.makedirs(directory, exist_ok=True)
+        if key not in self.done:
+            self.done[key] = []
+            manifest = load_manifest(os.path.join(directory, MANIFEST_NAME))
+            self.next_number[key] = next_segment_number(manifest, directory)
+        number = self.next_number[key]
+        self.next_number[key] += 1
+        name = f"seg-{number:06d}.ndjson"
+        return {
+            "file": name,
+            "fh": open(os.path.join(directory, name + ".part"), "w"),
+            "events": 0,
+            "min_ts_us": None,
+            "max_ts_us": None,
+            "sorted": True,
+        }
+
+    def _finish(self, key, seg):
+        seg["fh"].close()
+        self.done[key].append(seg)
+
+    def close(self):
+        for key, seg in self.open_segments.items():
+            self._finish(key, seg)
+        self.open_segments = {}
+
+        for (date_str, sensor_key), segments in self.done.items():
+            directory = sensor_dir(date_str, sensor_key, base_dir=self.base_dir)
+            manifest_path = os.path.join(directory, MANIFEST_NAME)
+            manifest = load_manifest(manifest_path)
+            replaced = [] if self.merge else manifest["segments"]
+            if not self.merge:
+                manifest["segments"] = []
+
+            for seg in segments:
+                path = os.path.join(directory, seg["file"])
+                os.replace(path + ".part", path)
+                entry = {
+                    "file": seg["file"],
+                    "events": seg["events"],
+                    "min_ts_us": seg["min_ts_us"],
+                    "max_ts_us": seg["max_ts_us"],
+                    "sorted": seg["sorted"],
+                    "bytes": os.path.getsize(path),
+                    "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+                }
+                if self.compacted_from:
+                    entry["compacted_from"] = self.compacted_from
+                manifest["segments"].append(entry)
+            manifest["day"] = date_str
+            manifest["sensor"] = sensor_key
+            save_manifest(manifest_path, manifest)
+
+            for old in replaced:
+                os.remove(os.path.join(directory, old["file"]))
+            legacy = os.path.join(self.base_dir, date_str, sensor_key + ".json")
+            if not self.merge and os.path.isfile(legacy):
+                os.remove(legacy)
+
+            added = sum(seg["events"] for seg in segments)
+            print(f"Saved {added} events to {directory} "
+                  f"({len(manifest['segments'])} segments, {manifest['events']} events)")
+        self.done = {}
+
+    def abort(self):
+        for key, seg in self.open_segments.items():
+            self._finish(key, seg)
+        self.open_segments = {}
+        for (date_str, sensor_key), segments in self.done.items():
+            directory = sensor_dir(date_str, sensor_key, base_dir=self.base_dir)
+            for seg in segments:
+                os.remove(os.path.join(directory, seg["file"] + ".part"))
+        self.done = {}
+
+
+def open_writer(layout=NORMALIZED_LAYOUT, merge=True):
+    if layout == "segments":
+        return SegmentWriter(merge=merge)
+    return NormalizedWriter(merge=merge)
+
+
+def with_ts_us(events):
+    """Fill in ts_us for events normalized before the field existed."""
+    for event in events:
+        if event.get("ts_us") is None:
+            event["ts_us"] = parse_epoch_us(event.get("timestamp"))
+        yield event
+
+
+def iter_segment(path):
+    with open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def day_sensors(date_str, base_dir=NORMALIZED_BASE):
+    """Sensor keys with normalized events for a day, in either layout."""
+    day_dir = os.path.join(base_dir, date_str)
+    if not os.path.isdir(day_dir):
+        return []
+    sensors = set()
+    for name in os.listdir(day_dir):
+        if name.endswith(".json") and os.path.isfile(os.path.join(day_dir, name)):
+            sensors.add(name[:-len(".json")])
+        elif os.path.isfile(os.path.join(day_dir, name, MANIFEST_NAME)):
+            sensors.add(name)
+    return sorted(sensors)
+
+
+def iter_day_events(date_str, sensor_key, base_dir=NORMALIZED_BASE):
+    """
+    Every normalized event of one day/sensor in timestamp order: the
+    segments listed in the manifest plus a legacy <sensor>.json if one is
+    still there. Sorted segments are merged lazily; unsorted ones (and
+    the legacy file) are sorted in memory one at a time.
+    """
+    directory = sensor_dir(date_str, sensor_key, base_dir)
+    manifest = load_manifest(os.path.join(directory, MANIFEST_NAME))
+    streams = [iter_segments(directory, manifest["segments"])]
+
+    legacy = os.path.join(base_dir, date_str, sensor_key + ".json")
+    if os.path.isfile(legacy):
+        with open(legacy, "r") as f:
+            streams.append(iter(sorted(with_ts_us(iter_json_array(f)), key=_ts_us_key)))
+
+    return heapq.merge(*streams, key=_ts_us_key)
+
+
+def iter_day_events_unsorted(date_str, sensor_key, base_dir=NORMALIZED_BASE):
+    """
+    Every normalized event of one day/sensor in storage order: the
+    manifest segments one after the other, then a legacy <sensor>.json.
+    Nothing is sorted, so memory stays flat; iter_day_events breaks
+    timestamp ties in this same order.
+    """
+    directory = sensor_dir(date_str, sensor_key, base_dir)
+    manifest = load_manifest(os.path.join(directory, MANIFEST_NAME))
+    for seg in manifest["segments"]:
+        yield from with_ts_us(iter_segment(os.path.join(directory, seg["file"])))
+
+    legacy = os.path.join(base_dir, date_str, sensor_key + ".json")
+    if os.path.isfile(legacy):
+        with open(legacy, "r") as f:
+            yield from with_ts_us(iter_json_array(f))
+
+
+def _ts_us_key(event):
+    return event["ts_us"] or 0
+
+
+def iter_segments(directory, segments):
+    """Events of the given manifest segments of one directory, merged by ts_us."""
+    streams = []
+    for seg in segments:
+        path = os.path.join(directory, seg["file"])
+        if seg.get("sorted") and "min_ts_us" in seg:
+            streams.append(with_ts_us(iter_segment(path)))
+        else:
+            streams.append(iter(sorted(with_ts_us(iter_segment(path)), key=_ts_us_key)))
+    return heapq.merge(*streams, key=_ts_us_key)
+
+
+def list_days(base_dir=NORMALIZED_BASE):
+    """Normalized day directories (YYYY-MM-DD), oldest first."""
+    if not os.path.isdir(base_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(base_dir)
+        if len(name) == 10 and name[4] == "-" and os.path.isdir(os.path.join(base_dir, name))
+    )
+
+
+def compact_day(date_str, sensor_key, base_dir=NORMALIZED_BASE):
+    """
+    Merge all segments of a day/sensor (and a legacy <sensor>.json) into
+    sorted segments of up to SEGMENT_MAX_EVENTS events. The new segments
+    list the originally written files they replace under `compacted_from`,
+    so incremental readers that track consumed segments can recognize them.
+    """
+    manifest = load_manifest(os.path.join(sensor_dir(date_str, sensor_key, base_dir), MANIFEST_NAME))
+    replaced = []
+    for seg in manifest["segments"]:
+        replaced.extend(seg.get("compacted_from") or [seg["file"]])
+    writer = SegmentWriter(base_dir, merge=False, compacted_from=replaced)
+    try:
+        for event in iter_day_events(date_str, sensor_key, base_dir):
+            writer.write(date_str, sensor_key, event)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+
+
+# -----------------------------
+# Ledger: consumed raw files + seen document ids
+# -----------------------------
+
+def open_ledger(path=LEDGER_PATH):
+    """
+    SQLite ledger shared by every normalize run. It records which raw
+    files were consumed (by name, size and mtime) and the _id of every hit
+    already normalized, partitioned by day, so overlapping dumps are
+    counted once.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS raw_files (
+            name TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime REAL NOT NULL,
+            hits INTEGER NOT NULL,
+            kept INTEGER NOT NULL,
+            processed_at TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS seen_ids (
+            day TEXT NOT NULL,
+            doc_id TEXT NOT NULL,
+            PRIMARY KEY (day, doc_id)
+        ) WITHOUT ROWID;
+        """
+    )
+    return conn
+
+
+def reset_ledger(conn):
+    conn.execute("DELETE FROM raw_files")
+    conn.execute("DELETE FROM seen_ids")
+    conn.commit()
+
+
+def is_consumed(conn, path):
+    stat = os.stat(path)
+    row = conn.execute(
+        "SELECT size, mtime FROM raw_files WHERE name = ?",
+        (os.path.basename(path),),
+    ).fetchone()
+    return row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime
+
+
+def mark_consumed(conn, path, hits, kept):
+    stat = os.stat(path)
+    conn.execute(
+        "INSERT OR REPLACE INTO raw_files VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            os.path.basename(path),
+            stat.st_size,
+            stat.st_mtime,
+            hits,
+            kept,
+            datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        ),
+    )
+
+
+def drop_seen_hits(hits, conn, stats):
+    """
+    Pass through only hits whose _id was never seen before (in this run
+    or an earlier one). Hits without an _id cannot be deduplicated and
+    are always kept. Ids are recorded in the current transaction, which
+    the caller commits once the output is safely written.
+    """
+    for hit in hits:
+        stats["hits"] += 1
+        doc_id = hit.get("_id")
+        if doc_id is not None:
+            src = hit.get("_source", {})
+            day = day_from_epoch_us(parse_epoch_us(src.get("@timestamp") or src.get("timestamp")))
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO seen_ids (day, doc_id) VALUES (?, ?)",
+                (day, doc_id),
+            )
+            if cur.rowcount == 0:
+                stats["duplicates"] += 1
+                continue
+        stats["kept"] += 1
+        yield hit
+
+
+# -----------------------------
+# Parallel (sharded) normalize
+# -----------------------------
+
+def plan_chunks(paths, chunk_bytes=CHUNK_BYTES):
+    """
+    Split raw dumps into work units (path, start, end, uncompressed_offset):
+    uncompressed NDJSON by byte range, gzip NDJSON by runs of whole gzip
+    members of about `chunk_bytes` decompressed, JSON arrays one unit per
+    file. A gzip file written as a single member cannot be split.
+    """
+    chunks = []
+    for path in paths:
+        size = os.path.getsize(path)
+        if path.endswith(".ndjson") and size > chunk_bytes:
+            for start in range(0, size, chunk_bytes):
+                chunks.append((path, start, min(start + chunk_bytes, size), start))
+        elif path.endswith(".ndjson.gz"):
+            members = gzip_members(path)
+            if len(members) < 2:
+                chunks.append((path, 0, None, 0))
+                if size * 4 > chunk_bytes:
+                    print(f"[WARN] {os.path.basename(path)} is a single gzip stream, normalized by one "
+                          "worker; sliced fetches (one gzip member per part) or fetcher.py "
+                          "--no-compress let --workers split it")
+                continue
+            # Group consecutive members up to ~chunk_bytes of decompressed data
+            group_start, group_offset = members[0][0], members[0][2]
+            for n, (start, end, offset) in enumerate(members):
+                following = members[n + 1][2] if n + 1 < len(members) else None
+                if following is None or following - group_offset >= chunk_bytes:
+                    chunks.append((path, group_start, end, group_offset))
+                    if following is not None:
+                        group_start, group_offset = end, following
+        else:
+            chunks.append((path, 0, None, 0))
+    return chunks
+
+
+def normalize_chunk(path, start, end, shard_dir, raw_ref=False, uncompressed_offset=0):
+    """Process-pool worker: normalize one chunk into NDJSON shards."""
+    os.makedirs(shard_dir, exist_ok=True)
+    stats = {"hits": 0}
+
+    if path.endswith(".ndjson.gz") and end is not None:
+        hits = iter_gzip_members(path, start, end, uncompressed_offset, with_refs=raw_ref)
+    elif path.endswith((".ndjson", ".ndjson.gz")):
+        hits = iter_ndjson_range(path, start, end, with_refs=raw_ref)
+    else:
+        hits = iter_hits(path)
+
+    def counted(hits):
+        for hit in hits:
+            stats["hits"] += 1
+            yield hit
+
+    writer = ShardWriter(shard_dir)
+    process_hits(counted(hits), None, writer)
+    return {"path": path, "hits": stats["hits"], "shards": writer.close()}
+
+
+def merge_shard(shard, conn, writer):
+    """
+    Append one shard to the final day file, dropping lines whose _id is
+    already in the ledger. The shard and its ids sidecar are streamed side
+    by side; lines are copied as text, not re-parsed. Returns (kept,
+    duplicates).
+    """
+    kept = duplicates = 0
+    with open(shard["path"], "r") as f, open(shard["path"] + ".ids", "r") as ids:
+        for line, entry in zip(f, ids):
+            doc_id, ts_us = json.loads(entry)
+            if doc_id is not None:
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO seen_ids (day, doc_id) VALUES (?, ?)",
+                    (shard["day"], doc_id),
+                )
+                if cur.rowcount == 0:
+                    duplicates += 1
+                    continue
+            writer.write_line(shard["day"], shard["sensor"], line.rstrip("\n"), ts_us)
+            kept += 1
+    return kept, duplicates
+
+
+def normalize_files_parallel(paths, conn, workers, merge=True, raw_ref=False, layout=NORMALIZED_LAYOUT):
+    """
+    Normalize raw dumps on a process pool. Each chunk (see plan_chunks) is
+    normalized by a worker into per-day/per-sensor NDJSON shards; the
+    parent then deduplicates against the ledger and appends the shards,
+    in input order, to the final day files.
+    """
+    chunks = plan_chunks(paths)
+    os.makedirs(NORMALIZED_BASE, exist_ok=True)
+    shard_root = tempfile.mkdtemp(prefix=".shards-", dir=NORMALIZED_BASE)
+
+    print(f"[INFO] Normalizing {len(chunks)} chunks on {workers} processes...")
+    started = time.monotonic()
+    file_stats = {path: {"hits": 0, "kept": 0, "duplicates": 0} for path in paths}
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(
+                    normalize_chunk,
+                    path,
+                    start,
+                    end,
+                    os.path.join(shard_root, f"{n:05d}"),
+                    raw_ref,
+                    offset,
+                )
+                for n, (path, start, end, offset) in enumerate(chunks)
+            ]
+            results = [f.result() for f in futures]
+
+        print(f"[INFO] Workers done in {time.monotonic() - started:.1f}s, merging shards...")
+
+        writer = open_writer(layout, merge=merge)
+        try:
+            for result in results:
+                stats = file_stats[result["path"]]
+                stats["hits"] += result["hits"]
+                for shard in result["shards"]:
+                    kept, duplicates = merge_shard(shard, conn, writer)
+                    stats["kept"] += kept
+                    stats["duplicates"] += duplicates
+        except BaseException:
+            writer.abort()
+            raise
+        writer.close()
+
+        for path, stats in file_stats.items():
+            mark_consumed(conn, path, stats["hits"], stats["kept"])
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        shutil.rmtree(shard_root, ignore_errors=True)
+
+    totals = {
+        key: sum(stats[key] for stats in file_stats.values())
+        for key in ("hits", "kept", "duplicates")
+    }
+    print(f"[INFO] {len(paths)} raw files: {totals['hits']} hits, "
+          f"{totals['kept']} new, {totals['duplicates']} duplicates dropped "
+          f"({time.monotonic() - started:.1f}s)")
+    return totals
 
 
 # -----------------------------
 # Main
 # -----------------------------
 
+def normalize_files(paths, conn, stream=False, merge=True, raw_ref=False, layout=NORMALIZED_LAYOUT):
+    """
+    Normalize every raw dump in `paths` in one batch, skipping hits whose
+    _id is already in the ledger, then record the files as consumed.
+    Nothing is committed to the ledger unless the output was written.
+
+    The segmented layout always writes through a SegmentWriter; `stream`
+    then only decides whether raw dumps are parsed hit by hit.
+
+    With `raw_ref`, events from NDJSON dumps point at their raw line
+    instead of embedding the full _source.
+    """
+    per_file = []
+    totals = {"hits": 0, "kept": 0, "duplicates": 0}
+
+    def new_hits():
+        for path in paths:
+            print("Loading honeypots from:", path)
+            stats = {"hits": 0, "kept": 0, "duplicates": 0}
+            if stream or raw_ref:
+                hits = iter_hits(path, with_refs=raw_ref)
+            else:
+                hits = load_hits_file(path)
+            yield from drop_seen_hits(hits, conn, stats)
+            per_file.append((path, stats))
+            for key in totals:
+                totals[key] += stats[key]
+
+    try:
+        if stream or layout == "segments":
+            writer = open_writer(layout, merge=merge)
+            try:
+                process_hits(new_hits(), None, writer)
+            except BaseException:
+                writer.abort()
+                raise
+            writer.close()
+        else:
+            out_dict = {}
+            process_hits(new_hits(), out_dict)
+            if out_dict:
+                save_normalized(out_dict, merge=merge)
+
+        for path, stats in per_file:
+            mark_consumed(conn, path, stats["hits"], stats["kept"])
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+    print(f"[INFO] {len(per_file)} raw files: {totals['hits']} hits, "
+          f"{totals['kept']} new, {totals['duplicates']} duplicates dropped")
+    return totals
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Normalize raw T-Pot hits per day and sensor.")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Parse and write hit by hit instead of loading the whole dump.",
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Forget the ledger, re-read every raw file and rewrite the day files from scratch.",
+    )
+    parser.add_argument(
+        "--raw-ref",
+        action="store_true",
+        default=os.getenv("TPOT_RAW_REF", "0") == "1",
+        help="Store a pointer to the raw hit (file, offset, length) instead of a full copy.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=NORMALIZE_WORKERS,
+        help="Normalize on this many processes (raw dumps are split into chunks).",
+    )
+    parser.add_argument(
+        "--layout",
+        choices=["segments", "json"],
+        default=NORMALIZED_LAYOUT,
+        help="Append NDJSON segments per day/sensor, or rewrite one JSON array per day/sensor.",
+    )
+    parser.add_argument(
+        "--compact",
+        metavar="YYYY-MM-DD",
+        help="Merge the segments of this day into sorted segments and exit.",
+    )
+    args = parser.parse_args()
+
     print("Using RAW_DIR:", ETL_DATA_DIR)
     print("Using NORMALIZED_BASE:", NORMALIZED_BASE)
 
-    # find latest raw honeypots files
-    honeypots_path = find_latest_file("tpot_raw_honeypots_")
+    if args.compact:
+        for sensor_key in day_sensors(args.compact):
+            compact_day(args.compact, sensor_key)
+        return
 
-    out_dict = {}
+    conn = open_ledger()
+    try:
+        if args.rebuild:
+            reset_ledger(conn)
 
-    # process honeypots file
-    if honeypots_path:
-        print("Loading honeypots from:", honeypots_path)
-        hits = load_json_file(honeypots_path)
-        process_hits(hits, out_dict)
-    else:
-        print("No honeypots raw file found.")
-    
+        raw_files = find_raw_files("tpot_raw_honeypots_")
+        pending = [p for p in raw_files if not is_consumed(conn, p)]
 
-    # save per-day, per-sensor files
-    if out_dict:
-        save_normalized(out_dict)
-    else:
-        print("No events to normalize.")
+        if not raw_files:
+            print("No honeypots raw file found.")
+            return
+        if not pending:
+            print(f"All {len(raw_files)} raw files already normalized.")
+            return
+
+        print(f"[INFO] {len(pending)} of {len(raw_files)} raw files to normalize")
+        if args.workers > 1:
+            totals = normalize_files_parallel(
+                pending,
+                conn,
+                args.workers,
+                merge=not args.rebuild,
+                raw_ref=args.raw_ref,
+                layout=args.layout,
+            )
+        else:
+            totals = normalize_files(
+                pending,
+                conn,
+                stream=args.stream,
+                merge=not args.rebuild,
+                raw_ref=args.raw_ref,
+                layout=args.layout,
+            )
+        if not totals["kept"]:
+            print("No events to normalize.")
+    finally:
+        conn.close()
 
 
 if __name__ == "__main__":
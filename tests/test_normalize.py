@@ -0,0 +1,117 @@
+import gzip
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+import normalize
+from tpot_standin import DayIndex
+
+DAY = "2025-11-11"
+NORMALIZE_PY = os.path.abspath(normalize.__file__)
+
+
+def write_raw_dumps(raw_dir, docs=4000):
+    """
+    Two overlapping dumps of a stand-in day: a multi-member gzip (one member
+    per part, as sliced fetches write it) with the first 3/4 of the hits and
+    a plain NDJSON with the second half.
+    """
+    index = DayIndex("logstash-2025.11.11", datetime(2025, 11, 11), docs, 0)
+    lines = [json.dumps(index.hit(pos)) + "\n" for pos in range(docs)]
+    os.makedirs(raw_dir)
+    with open(os.path.join(raw_dir, f"tpot_raw_honeypots_{DAY}.ndjson.gz"), "wb") as f:
+        for start in range(0, docs * 3 // 4, 500):
+            f.write(gzip.compress("".join(lines[start:min(start + 500, docs * 3 // 4)]).encode()))
+    with open(os.path.join(raw_dir, f"tpot_raw_honeypots_{DAY}_incremental.ndjson"), "w") as f:
+        f.writelines(lines[docs // 2:])
+
+
+def run_normalize(raw_dir, out_dir, *args):
+    env = dict(
+        os.environ,
+        TPOT_RAW_DIR=raw_dir,
+        TPOT_NORMALIZED_DIR=out_dir,
+        TPOT_NORMALIZE_LEDGER=os.path.join(out_dir, "ledger.sqlite"),
+        TPOT_NORMALIZE_CHUNK_MB="1",
+    )
+    result = subprocess.run(
+        [sys.executable, NORMALIZE_PY, *args], env=env, check=True, capture_output=True, text=True
+    )
+    return result.stdout
+
+
+def segment_files(out_dir):
+    files = {}
+    for root, _, names in os.walk(os.path.join(out_dir, DAY)):
+        for name in names:
+            if name.endswith(".ndjson"):
+                with open(os.path.join(root, name), "rb") as f:
+                    files[os.path.relpath(os.path.join(root, name), out_dir)] = f.read()
+    return files
+
+
+def test_ledger_day_follows_utc_day_of_offset_timestamp(tmp_path):
+    # 22:30 at -05:00 is 03:30 UTC the next day; process_hits and
+    # merge_shard file the event (and its ledger row) under that UTC day.
+    hit = {
+        "_id": "abc",
+        "_source": {"type": "Cowrie", "@timestamp": "2025-11-10T22:30:00-05:00"},
+    }
+    out = {}
+    normalize.process_hits([hit], out)
+    assert list(out) == ["2025-11-11"]
+
+    conn = normalize.open_ledger(str(tmp_path / "ledger.sqlite"))
+    stats = {"hits": 0, "kept": 0, "duplicates": 0}
+    assert list(normalize.drop_seen_hits([hit], conn, stats)) == [hit]
+    assert conn.execute("SELECT day, doc_id FROM seen_ids").fetchall() == [("2025-11-11", "abc")]
+
+    # The same hit seen again, e.g. in an overlapping dump, is dropped
+    assert list(normalize.drop_seen_hits([hit], conn, stats)) == []
+    assert stats == {"hits": 2, "kept": 1, "duplicates": 1}
+    conn.close()
+
+
+def test_ledger_is_per_day_and_survives_runs(tmp_path):
+    def hit(doc_id, ts):
+        return {"_id": doc_id, "_source": {"type": "Cowrie", "@timestamp": ts}}
+
+    path = str(tmp_path / "ledger.sqlite")
+    # _id is only unique within a daily index: the same id on two days is two hits
+    first = [hit("a", "2025-11-10T12:00:00Z"), hit("a", "2025-11-11T12:00:00Z"), hit("b", "2025-11-11T13:00:00Z")]
+    conn = normalize.open_ledger(path)
+    stats = {"hits": 0, "kept": 0, "duplicates": 0}
+    assert list(normalize.drop_seen_hits(first, conn, stats)) == first
+    conn.commit()
+    conn.close()
+
+    conn = normalize.open_ledger(path)
+    stats = {"hits": 0, "kept": 0, "duplicates": 0}
+    new = hit("c", "2025-11-11T14:00:00Z")
+    assert list(normalize.drop_seen_hits(first + [new], conn, stats)) == [new]
+    assert stats == {"hits": 4, "kept": 1, "duplicates": 3}
+    rows = conn.execute("SELECT day, COUNT(*) FROM seen_ids GROUP BY day ORDER BY day").fetchall()
+    assert rows == [("2025-11-10", 1), ("2025-11-11", 3)]
+    conn.close()
+
+
+def test_parallel_chunks_match_sequential(tmp_path):
+    raw_dir = str(tmp_path / "raw")
+    write_raw_dumps(raw_dir)
+    gz, plain = sorted(os.path.join(raw_dir, name) for name in os.listdir(raw_dir))
+    chunks = normalize.plan_chunks([gz, plain], 1024 * 1024)
+    assert len([c for c in chunks if c[0] == gz]) > 1
+    assert len([c for c in chunks if c[0] == plain]) > 1
+
+    sequential = str(tmp_path / "sequential")
+    parallel = str(tmp_path / "parallel")
+    out = run_normalize(raw_dir, sequential, "--raw-ref")
+    assert "4000 new, 1000 duplicates dropped" in out
+    out = run_normalize(raw_dir, parallel, "--raw-ref", "--workers", "3")
+    assert "4000 new, 1000 duplicates dropped" in out
+    assert segment_files(parallel) == segment_files(sequential)
+
+    # A rerun finds every raw file consumed
+    assert "already normalized" in run_normalize(raw_dir, parallel, "--workers", "3")
@@ -0,0 +1,125 @@
+import gc
+import json
+import os
+import random
+import tracemalloc
+from datetime import datetime
+
+import pytest
+
+import sessionize
+from normalize import NORMALIZERS, SegmentWriter
+from tpot_standin import DayIndex
+
+DAY = "2025-11-11"
+
+
+def standin_events(sensor_type, docs, seed=0):
+    """Normalized events of one sensor from a stand-in day, in random order."""
+    index = DayIndex("logstash-2025.11.11", datetime(2025, 11, 11), docs, seed)
+    normalize = NORMALIZERS[sensor_type][1]
+    events = [normalize(index.source(pos)) for pos in range(docs) if index.types[pos] == sensor_type]
+    random.Random(seed).shuffle(events)
+    return events
+
+
+def write_legacy_day(base_dir, sensor, events):
+    """A day as `normalize.py --layout json` writes it: one <sensor>.json array."""
+    os.makedirs(os.path.join(base_dir, DAY), exist_ok=True)
+    with open(os.path.join(base_dir, DAY, f"{sensor}.json"), "w") as f:
+        json.dump(events, f)
+
+
+def write_mixed_day(base_dir, sensor, events, segments=2):
+    """Unsorted segments from several normalize runs, plus a legacy <sensor>.json."""
+    part = len(events) // (segments + 1)
+    for n in range(segments):
+        writer = SegmentWriter(base_dir, merge=True)
+        for event in events[n * part:(n + 1) * part]:
+            writer.write(DAY, sensor, event)
+        writer.close()
+    write_legacy_day(base_dir, sensor, events[segments * part:])
+
+
+@pytest.fixture
+def dirs(tmp_path, monkeypatch):
+    normalized = str(tmp_path / "normalized")
+    sessionized = str(tmp_path / "sessionized")
+    monkeypatch.setattr(sessionize, "NORMALIZED_DIR", normalized)
+    monkeypatch.setattr(sessionize, "SESSIONIZED_DIR", sessionized)
+    return normalized, sessionized
+
+
+def peak_mb(func, *args):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def read_output(sessionized, sensor):
+    out_file = os.path.join(sessionized, DAY, f"{sensor}_sessions.ndjson")
+    with open(out_file, "rb") as f:
+        return f.read()
+
+
+def test_external_memory_holds_on_legacy_layout_day(dirs):
+    normalized, sessionized = dirs
+    write_legacy_day(normalized, "dionaea", standin_events("Dionaea", 12000))
+    os.makedirs(os.path.join(sessionized, DAY))
+
+    in_memory = peak_mb(sessionize.sessionize_unit, DAY, "dionaea", "python", ("src_ip",), 10000, 240, 0)
+    expected = read_output(sessionized, "dionaea")
+    external = peak_mb(sessionize.sessionize_unit, DAY, "dionaea", "python", ("src_ip",), 10000, 240, 0.5)
+
+    assert read_output(sessionized, "dionaea") == expected
+    # 0.5 MB budget, a 1 MB read buffer and the sorter's merge buffers
+    assert external < 8, (external, in_memory)
+    assert external < in_memory / 4, (external, in_memory)
+
+
+@pytest.mark.parametrize("key_fields", [("src_ip",), ()])
+def test_engines_agree(dirs, key_fields):
+    normalized, sessionized = dirs
+    events = standin_events("Cowrie", 3000) + standin_events("Dionaea", 3000, seed=1)
+    for sensor_type, sensor in (("Cowrie", "cowrie"), ("Dionaea", "dionaea")):
+        write_mixed_day(normalized, sensor, [e for e in events if e["sensor"] == sensor_type])
+    os.makedirs(os.path.join(sessionized, DAY))
+
+    engines = [("python", 0), ("python", 0.05)]
+    if sessionize.np is not None:
+        engines.append(("numpy", 0))
+    for sensor in ("cowrie", "dionaea"):
+        outputs = []
+        for engine, memory_mb in engines:
+            # Small caps so sessions get cut too
+            sessionize.sessionize_unit(DAY, sensor, engine, key_fields, 5, 30, memory_mb)
+            outputs.append(read_output(sessionized, sensor))
+        assert outputs[0]
+        assert all(out == outputs[0] for out in outputs[1:]), sensor
+
+
+def test_unchanged_units_are_skipped(dirs, capsys):
+    normalized, sessionized = dirs
+    events = standin_events("Dionaea", 2000)
+    half = len(events) // 2
+    write_mixed_day(normalized, "dionaea", events[:half], segments=1)
+
+    sessionize.process_day(DAY)
+    first = read_output(sessionized, "dionaea")
+    capsys.readouterr()
+    sessionize.process_day(DAY)
+    assert "dionaea unchanged since last run" in capsys.readouterr().out
+
+    # A new segment changes the input, so the unit is redone
+    writer = SegmentWriter(normalized, merge=True)
+    for event in events[half:]:
+        writer.write(DAY, "dionaea", event)
+    writer.close()
+    capsys.readouterr()
+    sessionize.process_day(DAY)
+    assert "dionaea unchanged" not in capsys.readouterr().out
+    assert len(read_output(sessionized, "dionaea")) > len(first)